@@ -0,0 +1,115 @@
+import argparse
+import random
+import time
+import tracemalloc
+
+import degrees
+import util
+from searchtrace import SearchTrace
+
+
+def use_linear_frontier():
+    """
+    Restore the original linear scan in `contains_state`, to measure the
+    indexed frontier against it.
+    """
+    def contains_state(self, state):
+        return any(node.state == state for node in self.frontier)
+
+    util.StackFrontier.contains_state = contains_state
+
+
+def report_memory():
+    """
+    Print memory held by the loaded dict tables and by the CompactGraph
+    compiled from them. Expects tracemalloc to have been started before
+    `load_data`.
+    """
+    tables, _ = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    graph = degrees.compact_graph()
+    seconds = time.perf_counter() - start
+    total, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"dict tables: {tables / 2**20:.1f} MiB")
+    print(f"csr graph: {(total - tables) / 2**20:.1f} MiB "
+          f"({graph.nbytes() / 2**20:.1f} MiB of adjacency arrays), "
+          f"compiled in {seconds:.2f}s")
+
+
+def random_pairs(n, seed):
+    """
+    Pick `n` random (source, target) pairs of people who starred in
+    at least one movie.
+    """
+    rng = random.Random(seed)
+    cast = sorted(person for person in degrees.people
+                  if degrees.people[person]["movies"])
+    return [(rng.choice(cast), rng.choice(cast)) for _ in range(n)]
+
+
+def run(mode, pairs):
+    """
+    Answer every pair with the given search mode.
+    Returns (path lengths, nodes expanded, seconds taken).
+
+    Timing is taken without a trace, and nodes expanded from a
+    second, traced, run over the same pairs.
+    """
+    lengths = []
+    start = time.perf_counter()
+    for source, target in pairs:
+        path = degrees.shortest_path(source, target, mode=mode)
+        lengths.append(None if path is None else len(path))
+    seconds = time.perf_counter() - start
+
+    expanded = 0
+    for source, target in pairs:
+        trace = SearchTrace()
+        degrees.shortest_path(source, target, mode=mode, trace=trace)
+        expanded += trace.expanded
+    return lengths, expanded, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare degrees search modes on random pairs.")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("-n", "--pairs", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--modes", nargs="+", default=list(degrees.SEARCH_MODES),
+                        choices=degrees.SEARCH_MODES)
+    parser.add_argument("--linear-frontier", action="store_true",
+                        help="use the old linear frontier membership scan")
+    parser.add_argument("--memory", action="store_true",
+                        help="trace memory used by the dict tables and CompactGraph")
+    parser.add_argument("--no-cache", dest="cache", action="store_false",
+                        help="parse the CSV files instead of using the snapshot")
+    args = parser.parse_args()
+    if args.linear_frontier:
+        use_linear_frontier()
+
+    print("Loading data...")
+    if args.memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    degrees.load_data(args.directory, cache=args.cache and not args.memory)
+    print(f"Data loaded in {time.perf_counter() - start:.2f}s.")
+    if args.memory:
+        report_memory()
+    pairs = random_pairs(args.pairs, args.seed)
+
+    reference = None
+    print(f"{'mode':<16}{'expanded':>12}{'seconds':>10}{'queries/s':>12}")
+    for mode in args.modes:
+        lengths, expanded, seconds = run(mode, pairs)
+        if reference is None:
+            reference = lengths
+        elif lengths != reference:
+            print(f"warning: {mode} disagrees with {args.modes[0]} on path lengths")
+        qps = len(pairs) / seconds if seconds else float("inf")
+        print(f"{mode:<16}{expanded:>12}{seconds:>10.3f}{qps:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
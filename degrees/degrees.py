@@ -1,6 +1,13 @@
+import argparse
 import csv
 import sys
+from collections import deque
 from pprint import pprint
+from graph import CompactGraph
+from landmarks import LandmarkIndex, open_index, write_index
+import nameindex
+from searchtrace import SearchTrace, json_lines
+from snapshot import open_snapshot, write_snapshot
 from util import Node, StackFrontier, QueueFrontier
 
 # Maps names to a set of corresponding person_ids
@@ -12,11 +19,44 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# CompactGraph compiled from people and movies on first use by the csr search
+graph = None
 
-def load_data(directory):
+# Snapshot the tables were mapped from, if any
+snapshot = None
+
+# Directory the current data was loaded from
+loaded_directory = None
+
+# LandmarkIndex over graph, opened or built on first use by the landmark search
+landmarks = None
+
+# NameIndex over names, opened or built on first fuzzy lookup
+name_lookup = None
+
+
+def load_data(directory, cache=True):
     """
     Load data from CSV files into memory.
+
+    With `cache`, the tables and compiled graph are saved to a binary
+    snapshot next to the CSV files. Later runs map that snapshot instead
+    of parsing the CSV files again, for as long as their sizes and
+    modification times are unchanged.
     """
+    global names, people, movies, graph, snapshot, loaded_directory, landmarks, name_lookup
+    graph = None
+    landmarks = None
+    name_lookup = None
+    loaded_directory = directory
+    snapshot = open_snapshot(directory) if cache else None
+    if snapshot is not None:
+        names = snapshot.table("names")
+        people = snapshot.table("people")
+        movies = snapshot.table("movies")
+        return
+    names, people, movies = {}, {}, {}
+
     # Load people
     with open(f"{directory}/people.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
@@ -51,15 +91,29 @@ def load_data(directory):
             except KeyError:
                 pass
 
+    if cache:
+        try:
+            write_snapshot(directory, names, people, movies, compact_graph())
+        except OSError:
+            pass
+
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    parser = argparse.ArgumentParser(
+        usage="python degrees.py [directory] [--mode MODE] [--no-cache] [--trace FILE]")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--no-cache", dest="cache", action="store_false",
+                        help="always parse the CSV files, skipping the snapshot")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="write search progress as JSON lines, - for stderr")
+    parser.add_argument("--mode", choices=SEARCH_MODES, default="bfs",
+                        help="search algorithm used to find the path")
+    args = parser.parse_args()
+    directory = args.directory
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    load_data(directory, cache=args.cache)
     print("Data loaded.")
 
     source = person_id_for_name(input("Name: "))
@@ -69,7 +123,15 @@ def main():
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    if args.trace is None:
+        path = shortest_path(source, target, mode=args.mode)
+    elif args.trace == "-":
+        path = shortest_path(source, target, mode=args.mode,
+                             trace=SearchTrace(json_lines(sys.stderr)))
+    else:
+        with open(args.trace, "w") as f:
+            path = shortest_path(source, target, mode=args.mode,
+                                 trace=SearchTrace(json_lines(f)))
 
     if path is None:
         print("Not connected.")
@@ -84,13 +146,29 @@ def main():
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
-def shortest_path(source, target):
+def shortest_path(source, target, mode="bfs", trace=None):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
+    `mode` picks the search algorithm, one of the keys of SEARCH_MODES.
+    If a SearchTrace is given, it is fed the people expanded, neighbors
+    generated and timing of each layer of the search.
+
     If no possible path, returns None.
     """
+    if trace is None:
+        return SEARCH_MODES[mode](source, target)
+    trace.mode = mode
+    path = SEARCH_MODES[mode](source, target, trace)
+    trace.done(path)
+    return path
+
+
+def breadth_first_path(source, target, trace=None):
+    """
+    Plain breadth-first search expanding outwards from the source only.
+    """
     # print("Initiated")
     start = Node(state=source, parent=None, action=None)
     frontier = QueueFrontier()
@@ -105,16 +183,11 @@ def shortest_path(source, target):
         start = frontier.remove()
 
         explored.add(start.state)
-        if len(explored) % 400 == 0:
-            # pprint(explored, compact=True)
-            d = 0
-            n = start
-            while n.parent:
-                d += 1
-                n = n.parent
-
-            print("Depth:", d)
-        for movie_id, person_id in neighbors_for_person(start.state):
+        neighbors = neighbors_for_person(start.state)
+        if trace is not None:
+            trace.dequeue(len(frontier.frontier))
+            trace.expand(len(neighbors))
+        for movie_id, person_id in neighbors:
             if not frontier.contains_state(person_id) and person_id not in explored:
                 child = Node(state=person_id, parent=start, action=movie_id)
                 frontier.add(child)
@@ -129,6 +202,217 @@ def shortest_path(source, target):
         # print(node)
 
 
+def movie_projection_path(source, target, trace=None):
+    """
+    Breadth-first search that treats movies as nodes in their own right.
+
+    A movie is marked explored the first time it is reached, so its cast
+    is scanned at most once per search instead of once per co-star, and
+    no (movie_id, person_id) neighbor sets are built. The path is still
+    reported as (movie_id, person_id) pairs.
+    """
+    if source == target:
+        return []
+
+    # Maps person_id to (previous person_id, movie_id) towards the source
+    parents = {source: (None, None)}
+    explored_movies = set()
+    queue = deque([source])
+    while queue:
+        person_id = queue.popleft()
+        if trace is not None:
+            trace.dequeue(len(queue))
+            trace.expand(sum(len(movies[movie_id]["stars"])
+                             for movie_id in people[person_id]["movies"]
+                             if movie_id not in explored_movies))
+        for movie_id in people[person_id]["movies"]:
+            if movie_id in explored_movies:
+                continue
+            explored_movies.add(movie_id)
+            for star in movies[movie_id]["stars"]:
+                if star in parents:
+                    continue
+                parents[star] = (person_id, movie_id)
+                if star == target:
+                    path = []
+                    while parents[star][0] is not None:
+                        previous, movie = parents[star]
+                        path.append((movie, star))
+                        star = previous
+                    path.reverse()
+                    return path
+                queue.append(star)
+    return None
+
+
+def bidirectional_path(source, target, trace=None):
+    """
+    Breadth-first search run from both ends at once.
+
+    Each round expands one whole layer of whichever side has the smaller
+    frontier, so both searches only have to reach about half the
+    separation. Returns the same path format as `breadth_first_path`.
+    """
+    if source == target:
+        return []
+
+    # Maps person_id to (previous person_id, movie_id) towards the source
+    forward = {source: (None, None)}
+    # Maps person_id to (next person_id, movie_id) towards the target
+    backward = {target: (None, None)}
+    forward_layer = [source]
+    backward_layer = [target]
+    forward_depth = backward_depth = 0
+
+    while forward_layer and backward_layer:
+        if len(forward_layer) <= len(backward_layer):
+            if trace is not None:
+                trace.begin_layer(forward_depth, len(forward_layer), side="forward")
+            forward_layer, meet = _expand_layer(
+                forward_layer, forward, backward, trace)
+            forward_depth += 1
+        else:
+            if trace is not None:
+                trace.begin_layer(backward_depth, len(backward_layer), side="backward")
+            backward_layer, meet = _expand_layer(
+                backward_layer, backward, forward, trace)
+            backward_depth += 1
+        if meet is not None:
+            return _join_paths(meet, forward, backward)
+    return None
+
+
+def _expand_layer(layer, parents, other, trace=None):
+    """
+    Expand every person in `layer`, recording newly reached people in
+    `parents`. Returns the next layer and the meeting point with the
+    other search, if any.
+
+    Whole layer is finished before returning so that, among all the
+    meeting points found in it, the one giving the shortest total path
+    is chosen.
+    """
+    next_layer = []
+    meet = None
+    best = None
+    depth = {}
+    for person_id in layer:
+        neighbors = neighbors_for_person(person_id)
+        if trace is not None:
+            trace.expand(len(neighbors))
+        for movie_id, neighbor in neighbors:
+            if neighbor in other:
+                if person_id not in depth:
+                    depth[person_id] = _chain_length(person_id, parents)
+                length = depth[person_id] + _chain_length(neighbor, other)
+                if best is None or length < best:
+                    best = length
+                    meet = (person_id, movie_id, neighbor)
+            if neighbor not in parents:
+                parents[neighbor] = (person_id, movie_id)
+                next_layer.append(neighbor)
+    return next_layer, meet
+
+
+def _chain_length(person_id, parents):
+    """
+    Number of steps from `person_id` back to the root of `parents`.
+    """
+    length = 0
+    while parents[person_id][0] is not None:
+        person_id = parents[person_id][0]
+        length += 1
+    return length
+
+
+def _join_paths(meet, forward, backward):
+    """
+    Build the (movie_id, person_id) path through the meeting edge
+    found between the forward and backward searches.
+    """
+    a, movie_id, b = meet
+    if a not in forward:
+        # Meeting edge was found by the backward search, flip it round
+        a, b = b, a
+    path = []
+    person_id = a
+    while forward[person_id][0] is not None:
+        previous, movie = forward[person_id]
+        path.append((movie, person_id))
+        person_id = previous
+    path.reverse()
+
+    path.append((movie_id, b))
+    person_id = b
+    while backward[person_id][0] is not None:
+        following, movie = backward[person_id]
+        path.append((movie, following))
+        person_id = following
+    return path
+
+
+def compact_graph():
+    """
+    Returns the CompactGraph of the loaded data, compiling it if needed.
+    """
+    global graph
+    if graph is None and snapshot is not None:
+        graph = snapshot.graph()
+    elif graph is None:
+        graph = CompactGraph.from_tables(people, movies)
+    return graph
+
+
+def csr_path(source, target, trace=None):
+    """
+    Breadth-first search on the integer indexed CompactGraph backend.
+    """
+    return compact_graph().shortest_path(source, target, trace)
+
+
+def landmark_index():
+    """
+    Returns the LandmarkIndex of the loaded data, mapping it from the
+    data directory or building and saving it there if needed.
+    """
+    global landmarks
+    if landmarks is None:
+        landmarks = open_index(loaded_directory, compact_graph())
+    if landmarks is None:
+        landmarks = LandmarkIndex.build(compact_graph())
+        try:
+            write_index(loaded_directory, landmarks)
+        except OSError:
+            pass
+    return landmarks
+
+
+def separation_bounds(source, target):
+    """
+    Returns (lower, upper) bounds on the degrees of separation between
+    two person_ids from the landmark index, without searching.
+    Both are None if the two are known not to be connected.
+    """
+    return landmark_index().bounds(source, target)
+
+
+def landmark_path(source, target, trace=None):
+    """
+    A* search guided by landmark distance lower bounds.
+    """
+    return landmark_index().shortest_path(source, target, trace)
+
+
+# Search algorithms selectable through `shortest_path(mode=...)`
+SEARCH_MODES = {
+    "bfs": breadth_first_path,
+    "bidirectional": bidirectional_path,
+    "movies": movie_projection_path,
+    "csr": csr_path,
+    "landmark": landmark_path,
+}
+
+
 def person_id_for_name(name):
     """
     Returns the IMDB id for a person's name,
@@ -136,6 +420,16 @@ def person_id_for_name(name):
     """
     person_ids = list(names.get(name.lower(), set()))
     if len(person_ids) == 0:
+        person_ids = suggest_person_ids(name)
+        if not person_ids:
+            return None
+        print(f"No exact match for '{name}'. Did you mean:")
+        for person_id in person_ids:
+            person = people[person_id]
+            print(f"ID: {person_id}, Name: {person['name']}, Birth: {person['birth']}")
+        person_id = input("Intended Person ID: ")
+        if person_id in person_ids:
+            return person_id
         return None
     elif len(person_ids) > 1:
         print(f"Which '{name}'?")
@@ -155,6 +449,34 @@ def person_id_for_name(name):
         return person_ids[0]
 
 
+def name_index():
+    """
+    Returns the NameIndex of the loaded names, loading it from the data
+    directory or building and saving it there if needed.
+    """
+    global name_lookup
+    if name_lookup is None:
+        name_lookup = nameindex.open_index(loaded_directory)
+    if name_lookup is None:
+        name_lookup = nameindex.NameIndex.build(names)
+        try:
+            nameindex.write_index(loaded_directory, name_lookup)
+        except OSError:
+            pass
+    return name_lookup
+
+
+def suggest_person_ids(name, limit=5):
+    """
+    Returns person_ids of the people whose names are the closest
+    fuzzy matches for `name`, best first.
+    """
+    person_ids = []
+    for _, match in name_index().search(name, limit):
+        person_ids.extend(sorted(names[match]))
+    return person_ids[:limit]
+
+
 def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
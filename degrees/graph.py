@@ -0,0 +1,160 @@
+from array import array
+from collections import deque
+
+
+class CompactGraph():
+    """
+    People/movies bipartite graph stored as compressed sparse rows.
+
+    People and movies are interned to dense integer indices. The movies
+    of person `p` are `person_movies[person_offsets[p]:person_offsets[p + 1]]`
+    and the stars of movie `m` are `movie_stars[movie_offsets[m]:movie_offsets[m + 1]]`.
+    """
+
+    def __init__(self, person_ids, movie_ids, person_offsets, person_movies,
+                 movie_offsets, movie_stars):
+        self.person_ids = person_ids
+        self.movie_ids = movie_ids
+        self.person_index = {person_id: i for i, person_id in enumerate(person_ids)}
+        self.movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_stars = movie_stars
+
+    @classmethod
+    def from_tables(cls, people, movies):
+        """
+        Compile the `people` and `movies` dicts built by `load_data`.
+        """
+        person_ids = list(people)
+        movie_ids = list(movies)
+        person_index = {person_id: i for i, person_id in enumerate(person_ids)}
+        movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+
+        person_offsets, person_movies = _rows(
+            (people[person_id]["movies"] for person_id in person_ids), movie_index)
+        movie_offsets, movie_stars = _rows(
+            (movies[movie_id]["stars"] for movie_id in movie_ids), person_index)
+        return cls(person_ids, movie_ids, person_offsets, person_movies,
+                   movie_offsets, movie_stars)
+
+    def nbytes(self):
+        """
+        Size of the adjacency arrays in bytes.
+        """
+        return sum(a.itemsize * len(a) for a in (
+            self.person_offsets, self.person_movies,
+            self.movie_offsets, self.movie_stars))
+
+    def neighbors(self, p):
+        """
+        Yield (movie index, person index) pairs for everyone who starred
+        with person index `p`.
+        """
+        person_offsets, person_movies = self.person_offsets, self.person_movies
+        movie_offsets, movie_stars = self.movie_offsets, self.movie_stars
+        for i in range(person_offsets[p], person_offsets[p + 1]):
+            m = person_movies[i]
+            for j in range(movie_offsets[m], movie_offsets[m + 1]):
+                if movie_stars[j] != p:
+                    yield m, movie_stars[j]
+
+    def shortest_path(self, source, target, trace=None):
+        """
+        Breadth-first search over the arrays between two person_ids.
+        Returns a list of (movie_id, person_id) pairs, or None if
+        the two are not connected. Reports to `trace` if given.
+
+        A movie's cast is scanned only the first time the movie is
+        reached, since every co-star found through it later would
+        already have been seen.
+        """
+        if source == target:
+            return []
+        s = self.person_index[source]
+        t = self.person_index[target]
+
+        person_offsets, person_movies = self.person_offsets, self.person_movies
+        movie_offsets, movie_stars = self.movie_offsets, self.movie_stars
+        parent = array("i", [-1]) * len(self.person_ids)
+        via = array("i", [-1]) * len(self.person_ids)
+        movie_seen = bytearray(len(self.movie_ids))
+        parent[s] = s
+
+        queue = deque([s])
+        while queue:
+            p = queue.popleft()
+            if trace is not None:
+                trace.dequeue(len(queue))
+                trace.expand(sum(
+                    movie_offsets[m + 1] - movie_offsets[m]
+                    for m in person_movies[person_offsets[p]:person_offsets[p + 1]]
+                    if not movie_seen[m]))
+            for i in range(person_offsets[p], person_offsets[p + 1]):
+                m = person_movies[i]
+                if movie_seen[m]:
+                    continue
+                movie_seen[m] = 1
+                for j in range(movie_offsets[m], movie_offsets[m + 1]):
+                    q = movie_stars[j]
+                    if parent[q] != -1:
+                        continue
+                    parent[q] = p
+                    via[q] = m
+                    if q == t:
+                        return self._path(parent, via, s, t)
+                    queue.append(q)
+        return None
+
+    def distances(self, s):
+        """
+        Breadth-first search from person index `s` to everyone.
+        Returns an array of degrees of separation per person index,
+        -1 for people who can't be reached.
+        """
+        person_offsets, person_movies = self.person_offsets, self.person_movies
+        movie_offsets, movie_stars = self.movie_offsets, self.movie_stars
+        distance = array("h", [-1]) * len(self.person_ids)
+        movie_seen = bytearray(len(self.movie_ids))
+        distance[s] = 0
+
+        layer = [s]
+        depth = 0
+        while layer:
+            depth += 1
+            next_layer = []
+            for p in layer:
+                for i in range(person_offsets[p], person_offsets[p + 1]):
+                    m = person_movies[i]
+                    if movie_seen[m]:
+                        continue
+                    movie_seen[m] = 1
+                    for j in range(movie_offsets[m], movie_offsets[m + 1]):
+                        q = movie_stars[j]
+                        if distance[q] == -1:
+                            distance[q] = depth
+                            next_layer.append(q)
+            layer = next_layer
+        return distance
+
+    def _path(self, parent, via, s, t):
+        path = []
+        while t != s:
+            path.append((self.movie_ids[via[t]], self.person_ids[t]))
+            t = parent[t]
+        path.reverse()
+        return path
+
+
+def _rows(groups, index):
+    """
+    Build (offsets, values) arrays from an iterable of id collections,
+    translating each id through `index` and dropping unknown ones.
+    """
+    offsets = array("q", [0])
+    values = array("i")
+    for group in groups:
+        values.extend(sorted(index[key] for key in group if key in index))
+        offsets.append(len(values))
+    return offsets, values
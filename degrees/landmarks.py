@@ -0,0 +1,217 @@
+import argparse
+import heapq
+import os
+import sys
+import time
+from array import array
+
+from snapshot import map_sections, read_section, source_key, write_sections
+
+# Bump whenever the layout of the index file changes
+INDEX_VERSION = 2
+INDEX_NAME = "landmarks.idx"
+MAGIC = b"LANDMARK"
+UNREACHABLE = -1
+
+
+class LandmarkIndex():
+    """
+    Degrees of separation from a few well connected landmark people
+    to everyone, stored person-major: the distances of person index `p`
+    to every landmark are `distances[p * k:(p + 1) * k]`.
+
+    By the triangle inequality, |d(L, s) - d(L, t)| <= d(s, t) <= d(L, s) + d(L, t)
+    for every landmark L, which gives the bounds and the A* heuristic.
+    """
+
+    def __init__(self, graph, landmarks, distances):
+        self.graph = graph
+        self.landmarks = landmarks
+        self.distances = distances
+        self.k = len(landmarks)
+
+    @classmethod
+    def build(cls, graph, k=24):
+        """
+        Pick the `k` people with the most co-star slots as landmarks
+        and run a breadth-first search from each of them.
+        """
+        person_offsets, person_movies = graph.person_offsets, graph.person_movies
+        movie_offsets = graph.movie_offsets
+
+        def degree(p):
+            return sum(movie_offsets[m + 1] - movie_offsets[m]
+                       for m in person_movies[person_offsets[p]:person_offsets[p + 1]])
+
+        k = min(k, len(graph.person_ids))
+        landmarks = array("i", heapq.nlargest(k, range(len(graph.person_ids)), key=degree))
+        distances = array("h", [UNREACHABLE]) * (len(graph.person_ids) * k)
+        for l, landmark in enumerate(landmarks):
+            for p, d in enumerate(graph.distances(landmark)):
+                distances[p * k + l] = d
+        return cls(graph, landmarks, distances)
+
+    def row(self, p):
+        return self.distances[p * self.k:(p + 1) * self.k]
+
+    def bounds(self, source, target):
+        """
+        Returns (lower, upper) bounds on the degrees of separation
+        between two person_ids. Upper is None if no landmark reaches both,
+        and both are None if a landmark shows they aren't connected.
+        """
+        s = self.graph.person_index[source]
+        t = self.graph.person_index[target]
+        if s == t:
+            return 0, 0
+        lower, upper = 1, None
+        for ds, dt in zip(self.row(s), self.row(t)):
+            if (ds == UNREACHABLE) != (dt == UNREACHABLE):
+                return None, None
+            if ds == UNREACHABLE:
+                continue
+            lower = max(lower, abs(ds - dt))
+            if upper is None or ds + dt < upper:
+                upper = ds + dt
+        return lower, upper
+
+    def shortest_path(self, source, target, trace=None):
+        """
+        A* search between two person_ids, guided by the landmark lower
+        bound on the remaining distance. Returns the same path format
+        as `degrees.shortest_path`.
+
+        If a trace is given, each layer reported to it is one contour
+        of equal estimated path length.
+        """
+        if source == target:
+            return []
+        graph = self.graph
+        s = graph.person_index[source]
+        t = graph.person_index[target]
+        target_row = self.row(t)
+        if any((ds == UNREACHABLE) != (dt == UNREACHABLE)
+               for ds, dt in zip(self.row(s), target_row)):
+            return None
+
+        def heuristic(p):
+            # Anyone but the target is at least one step away
+            return max((abs(dp - dt) for dp, dt in zip(self.row(p), target_row)
+                        if dp != UNREACHABLE), default=1) or 1
+
+        person_offsets, person_movies = graph.person_offsets, graph.person_movies
+        movie_offsets, movie_stars = graph.movie_offsets, graph.movie_stars
+        # Maps person index to (parent person index, movie index)
+        parents = {s: (None, None)}
+        best = {s: 0}
+        closed = set()
+        heap = [(heuristic(s), 0, s)]
+        while heap:
+            f, g, p = heapq.heappop(heap)
+            if p in closed:
+                continue
+            closed.add(p)
+            if trace is not None:
+                if f != trace.depth:
+                    trace.begin_layer(f, len(heap) + 1)
+                trace.expand(sum(
+                    movie_offsets[m + 1] - movie_offsets[m]
+                    for m in person_movies[person_offsets[p]:person_offsets[p + 1]]))
+            for i in range(person_offsets[p], person_offsets[p + 1]):
+                m = person_movies[i]
+                for j in range(movie_offsets[m], movie_offsets[m + 1]):
+                    q = movie_stars[j]
+                    if q in closed or (q in best and best[q] <= g + 1):
+                        continue
+                    best[q] = g + 1
+                    parents[q] = (p, m)
+                    if q == t:
+                        # Every other open path costs at least g + 1 since
+                        # the heuristic never drops below one before the target
+                        return self._path(parents, t)
+                    heapq.heappush(heap, (g + 1 + heuristic(q), g + 1, q))
+        return None
+
+    def _path(self, parents, t):
+        path = []
+        while parents[t][0] is not None:
+            p, m = parents[t]
+            path.append((self.graph.movie_ids[m], self.graph.person_ids[t]))
+            t = p
+        path.reverse()
+        return path
+
+
+def index_path(directory):
+    return os.path.join(directory, INDEX_NAME)
+
+
+def write_index(directory, index):
+    """
+    Save the index next to the CSV files, with the landmark and distance
+    arrays as raw sections of a `write_sections` file.
+    """
+    header = {
+        "version": INDEX_VERSION,
+        "key": source_key(directory),
+        "k": index.k,
+        "people": len(index.graph.person_ids),
+    }
+    write_sections(index_path(directory), MAGIC, header,
+                   {"landmarks": index.landmarks, "distances": index.distances})
+
+
+def open_index(directory, graph):
+    """
+    Map a saved index for `graph`. Returns None if there is none
+    or if it is out of date.
+    """
+    opened = map_sections(index_path(directory), MAGIC, INDEX_VERSION, source_key(directory))
+    if opened is None:
+        return None
+    mapping, header = opened
+    if header.get("people") != len(graph.person_ids):
+        return None
+    k = header["k"]
+    landmarks = read_section(mapping, header["sections"]["landmarks"])
+    distances = read_section(mapping, header["sections"]["distances"])
+    if len(landmarks) != k or len(distances) != k * len(graph.person_ids):
+        return None
+    return LandmarkIndex(graph, landmarks, distances)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build the landmark index or query separation bounds.")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--build", action="store_true",
+                        help="rebuild the index even if an up to date one exists")
+    parser.add_argument("-k", type=int, default=24, help="number of landmarks")
+    args = parser.parse_args()
+
+    import degrees
+    print("Loading data...")
+    degrees.load_data(args.directory)
+    print("Data loaded.")
+    if args.build:
+        start = time.perf_counter()
+        index = LandmarkIndex.build(degrees.compact_graph(), args.k)
+        write_index(args.directory, index)
+        print(f"Built {index.k} landmarks in {time.perf_counter() - start:.2f}s.")
+    index = degrees.landmark_index()
+
+    source = degrees.person_id_for_name(input("Name: "))
+    if source is None:
+        sys.exit("Person not found.")
+    target = degrees.person_id_for_name(input("Name: "))
+    if target is None:
+        sys.exit("Person not found.")
+    lower, upper = index.bounds(source, target)
+    if lower is None:
+        print("Not connected.")
+    else:
+        print(f"Between {lower} and {upper if upper is not None else '?'} degrees of separation.")
+
+
+if __name__ == "__main__":
+    main()
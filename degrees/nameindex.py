@@ -0,0 +1,163 @@
+import argparse
+import os
+import pickle
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+from snapshot import source_key
+
+# Bump whenever the layout of the index file changes
+INDEX_VERSION = 1
+INDEX_NAME = "names.idx"
+
+# Roughly how many postings entries a fuzzy lookup reads before it stops
+# pulling in more (increasingly common) trigrams
+SCAN_BUDGET = 200000
+# Candidates reranked exactly after counting shared trigrams
+RERANK = 200
+
+
+def trigrams(name):
+    """
+    Set of the three letter substrings of a name, padded so that
+    the start and end of the name count too.
+    """
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex():
+    """
+    Prefix and fuzzy lookup over lowercased names.
+
+    `keys` holds the distinct names sorted, for binary searched prefix
+    lookups, and `postings` maps each trigram to an array of indices
+    into `keys` of the names containing it.
+    """
+
+    def __init__(self, keys, postings):
+        self.keys = keys
+        self.postings = postings
+
+    @classmethod
+    def build(cls, names):
+        """
+        Index the lowercased names of the `names` table from `load_data`.
+        """
+        keys = sorted(names)
+        postings = {}
+        for i, key in enumerate(keys):
+            for gram in trigrams(key):
+                if gram not in postings:
+                    postings[gram] = array("i")
+                postings[gram].append(i)
+        return cls(keys, postings)
+
+    def prefix(self, query, limit=10):
+        """
+        Returns up to `limit` names starting with `query`, in order.
+        """
+        query = query.lower()
+        matches = []
+        i = bisect_left(self.keys, query)
+        while i < len(self.keys) and len(matches) < limit and self.keys[i].startswith(query):
+            matches.append(self.keys[i])
+            i += 1
+        return matches
+
+    def search(self, query, limit=10):
+        """
+        Returns up to `limit` (score, name) pairs most similar to `query`,
+        best first. Score is the Dice coefficient of the two trigram sets,
+        so 1.0 is an exact match.
+
+        Candidates come from the rarest trigrams of the query first, so
+        very common trigrams are skipped once enough postings were read.
+        """
+        query = query.lower().strip()
+        grams = trigrams(query)
+        lists = sorted((self.postings[gram] for gram in grams if gram in self.postings), key=len)
+        counts = Counter()
+        scanned = 0
+        for n, posting in enumerate(lists):
+            if n >= 2 and scanned + len(posting) > SCAN_BUDGET:
+                break
+            counts.update(posting)
+            scanned += len(posting)
+
+        ranked = []
+        for i, _ in counts.most_common(RERANK):
+            key = self.keys[i]
+            key_grams = trigrams(key)
+            score = 2 * len(grams & key_grams) / (len(grams) + len(key_grams))
+            if key.startswith(query):
+                # Favour names the query is a prefix of among equal scores
+                score += 1e-6
+            ranked.append((min(score, 1.0), key))
+        ranked.sort(key=lambda match: (-match[0], match[1]))
+        return ranked[:limit]
+
+
+def index_path(directory):
+    return os.path.join(directory, INDEX_NAME)
+
+
+def write_index(directory, index):
+    path = index_path(directory)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump({
+            "version": INDEX_VERSION,
+            "key": source_key(directory),
+            "keys": index.keys,
+            "postings": index.postings,
+        }, f, pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def open_index(directory):
+    """
+    Load a saved index. Returns None if there is none or it is out of date.
+    """
+    try:
+        with open(index_path(directory), "rb") as f:
+            data = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+    if data.get("version") != INDEX_VERSION or data.get("key") != source_key(directory):
+        return None
+    return NameIndex(data["keys"], data["postings"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fuzzy and prefix name lookups.")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("query")
+    parser.add_argument("--prefix", action="store_true", help="prefix lookup instead of fuzzy")
+    parser.add_argument("-n", "--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    import degrees
+    degrees.load_data(args.directory)
+    start = time.perf_counter()
+    index = degrees.name_index()
+    print(f"Index ready in {time.perf_counter() - start:.3f}s.")
+
+    start = time.perf_counter()
+    if args.prefix:
+        matches = [(None, name) for name in index.prefix(args.query, args.limit)]
+    else:
+        matches = index.search(args.query, args.limit)
+    seconds = time.perf_counter() - start
+    for score, name in matches:
+        for person_id in sorted(degrees.names[name]):
+            person = degrees.people[person_id]
+            prefix = f"{score:.3f} " if score is not None else ""
+            print(f"{prefix}ID: {person_id}, Name: {person['name']}, Birth: {person['birth']}")
+    print(f"Lookup took {seconds * 1000:.2f}ms.")
+
+
+if __name__ == "__main__":
+    main()
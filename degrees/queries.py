@@ -0,0 +1,155 @@
+import argparse
+import json
+import sys
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import degrees
+from searchtrace import SearchTrace
+
+
+def resolve(name):
+    """
+    Non-interactive version of `degrees.person_id_for_name`.
+    Accepts a name or a person_id. Returns (person_id, error).
+    """
+    if name in degrees.people:
+        return name, None
+    person_ids = sorted(degrees.names.get(name.lower(), set()))
+    if len(person_ids) == 0:
+        suggestions = degrees.suggest_person_ids(name)
+        if suggestions:
+            return None, (f"Person not found: {name}, closest matches are the IDs "
+                          f"{', '.join(suggestions)}")
+        return None, f"Person not found: {name}"
+    if len(person_ids) > 1:
+        return None, f"Ambiguous name {name}, use one of the IDs {', '.join(person_ids)}"
+    return person_ids[0], None
+
+
+def answer(source_name, target_name, mode="bfs"):
+    """
+    Answer one query with an already loaded dataset.
+    Returns a JSON-serialisable dict with the path, the time the
+    search took, how many people it expanded and how many neighbors
+    those produced.
+    """
+    result = {"source": source_name, "target": target_name}
+    source, error = resolve(source_name)
+    if source is None:
+        result["error"] = error
+        return result
+    target, error = resolve(target_name)
+    if target is None:
+        result["error"] = error
+        return result
+
+    trace = SearchTrace()
+    path = degrees.shortest_path(source, target, mode=mode, trace=trace)
+    result["seconds"] = trace.seconds
+    result["expanded"] = trace.expanded
+    result["generated"] = trace.generated
+    if path is None:
+        result["degrees"] = None
+        result["path"] = None
+    else:
+        result["degrees"] = len(path)
+        result["path"] = [
+            {"movie": degrees.movies[movie_id]["title"],
+             "person": degrees.people[person_id]["name"]}
+            for movie_id, person_id in path
+        ]
+    return result
+
+
+def run_batch(lines, mode, out):
+    """
+    Answer every "source<TAB>target" line, writing one JSON result
+    per line to `out` as soon as it is known.
+    """
+    for line in lines:
+        line = line.rstrip("\n")
+        if not line.strip():
+            continue
+        if "\t" not in line:
+            result = {"line": line, "error": "Expected source<TAB>target"}
+        else:
+            source_name, target_name = line.split("\t", 1)
+            result = answer(source_name.strip(), target_name.strip(), mode)
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """
+    Answers GET /path?source=NAME&target=NAME[&mode=MODE] with JSON.
+    """
+    mode = "bfs"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path != "/path" or "source" not in query or "target" not in query:
+            self.reply(400, {"error": "Usage: /path?source=NAME&target=NAME[&mode=MODE]"})
+            return
+        mode = query.get("mode", [self.mode])[0]
+        if mode not in degrees.SEARCH_MODES:
+            self.reply(400, {"error": f"Unknown mode {mode}"})
+            return
+        result = answer(query["source"][0], query["target"][0], mode)
+        self.reply(404 if "error" in result else 200, result)
+
+    def reply(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def serve(host, port, mode):
+    """
+    Answer queries over HTTP until interrupted, keeping the
+    loaded data resident between them.
+    """
+    QueryHandler.mode = mode
+    server = HTTPServer((host, port), QueryHandler)
+    print(f"Serving on http://{host}:{port}/path?source=NAME&target=NAME")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Answer many degrees queries against one loaded dataset.")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--mode", choices=degrees.SEARCH_MODES, default="bfs")
+    parser.add_argument("--no-cache", dest="cache", action="store_false")
+    commands = parser.add_mutually_exclusive_group(required=True)
+    commands.add_argument("--batch", metavar="FILE",
+                          help="file of source<TAB>target lines, - for stdin")
+    commands.add_argument("--serve", metavar="PORT", type=int,
+                          help="start an HTTP server on PORT")
+    parser.add_argument("--host", default="127.0.0.1")
+    args = parser.parse_args()
+
+    print("Loading data...", file=sys.stderr)
+    degrees.load_data(args.directory, cache=args.cache)
+    print("Data loaded.", file=sys.stderr)
+
+    if args.serve is not None:
+        serve(args.host, args.serve, args.mode)
+    elif args.batch == "-":
+        run_batch(sys.stdin, args.mode, sys.stdout)
+    else:
+        with open(args.batch, encoding="utf-8") as f:
+            run_batch(f, args.mode, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
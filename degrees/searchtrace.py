@@ -0,0 +1,92 @@
+import json
+import time
+
+
+class SearchTrace():
+    """
+    Instrumentation for a single search.
+
+    Searches mark the start of each breadth-first layer with `begin_layer`
+    (or `dequeue` for FIFO searches without explicit layers) and report
+    every expanded person with `expand`. Each finished layer and the end
+    of the search are passed to `callback` as an event dict, and running
+    totals are kept on the trace.
+
+    Searches only touch the trace when one is given, so leaving it out
+    costs nothing.
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.mode = None
+        self.expanded = 0
+        self.generated = 0
+        self.seconds = None
+        self.start = time.perf_counter()
+        self.layer = None
+        self.layer_left = 0
+        self.depth = -1
+
+    def begin_layer(self, depth, frontier, **extra):
+        """
+        Start a new layer of `frontier` people at distance `depth`,
+        finishing the previous one. `extra` is added to the layer event.
+        """
+        self._end_layer()
+        self.depth = depth
+        self.layer_left = frontier
+        self.layer = {"event": "layer", "depth": depth, "frontier": frontier,
+                      "expanded": 0, "generated": 0, **extra,
+                      "start": time.perf_counter()}
+
+    def dequeue(self, queued):
+        """
+        Follow layers of a FIFO search. Call when removing a person,
+        with the number of people still queued after removing it.
+        """
+        if self.layer_left == 0:
+            self.begin_layer(self.depth + 1, queued + 1)
+        self.layer_left -= 1
+
+    def expand(self, generated):
+        """
+        Count one expanded person who produced `generated` neighbors.
+        """
+        self.expanded += 1
+        self.generated += generated
+        if self.layer is not None:
+            self.layer["expanded"] += 1
+            self.layer["generated"] += generated
+
+    def done(self, path):
+        """
+        Finish the search that returned `path`.
+        """
+        self._end_layer()
+        self.seconds = time.perf_counter() - self.start
+        self._emit({"event": "done", "found": path is not None,
+                    "degrees": None if path is None else len(path),
+                    "expanded": self.expanded, "generated": self.generated,
+                    "seconds": self.seconds})
+
+    def _end_layer(self):
+        if self.layer is not None:
+            layer = self.layer
+            layer["seconds"] = time.perf_counter() - layer.pop("start")
+            self.layer = None
+            self._emit(layer)
+
+    def _emit(self, event):
+        if self.callback is not None:
+            if self.mode is not None:
+                event["mode"] = self.mode
+            self.callback(event)
+
+
+def json_lines(file):
+    """
+    Returns a trace callback writing each event as a line of JSON to `file`.
+    """
+    def write(event):
+        file.write(json.dumps(event) + "\n")
+    return write
@@ -0,0 +1,139 @@
+import argparse
+import csv
+import os
+import random
+import sys
+import time
+from collections import Counter
+from multiprocessing import Pool
+
+import degrees
+
+# CompactGraph searched by pool workers. Set before the pool starts so
+# forked workers share it copy-on-write, or loaded from the mmapped
+# snapshot by `_init_worker` where workers are spawned instead.
+graph = None
+
+
+def _init_worker(directory):
+    global graph
+    if graph is None:
+        degrees.load_data(directory)
+        graph = degrees.compact_graph()
+
+
+def source_stats(s):
+    """
+    Breadth-first search from person index `s`. Returns
+    (s, histogram of distances to other people, eccentricity), with
+    -1 counting the people not reachable from `s`.
+    """
+    histogram = Counter(graph.distances(s))
+    del histogram[0]
+    eccentricity = max((d for d in histogram if d > 0), default=0)
+    return s, histogram, eccentricity
+
+
+def many_sources(sources, workers, out):
+    """
+    Run `source_stats` for every source index across a process pool,
+    writing one CSV row per source as results arrive.
+    Returns the histogram summed over all sources.
+    """
+    writer = csv.writer(out)
+    writer.writerow(["person_id", "name", "reached", "mean_distance", "eccentricity"])
+    total = Counter()
+    chunksize = max(1, len(sources) // (workers * 8))
+    with Pool(workers, initializer=_init_worker,
+              initargs=(degrees.loaded_directory,)) as pool:
+        for s, histogram, eccentricity in pool.imap_unordered(
+                source_stats, sources, chunksize):
+            total.update(histogram)
+            reached = sum(n for d, n in histogram.items() if d > 0)
+            mean = (sum(d * n for d, n in histogram.items() if d > 0) / reached
+                    if reached else None)
+            person_id = graph.person_ids[s]
+            writer.writerow([person_id, degrees.people[person_id]["name"],
+                             reached, f"{mean:.4f}" if mean is not None else "",
+                             eccentricity])
+    return total
+
+
+def center_numbers(center, out):
+    """
+    Write every person's degrees of separation from person index
+    `center` (their "Bacon number") as CSV. Returns the histogram of
+    distances to everyone else, laid out as in `source_stats`.
+    """
+    writer = csv.writer(out)
+    writer.writerow(["person_id", "name", "distance"])
+    histogram = Counter()
+    for p, d in enumerate(graph.distances(center)):
+        if p != center:
+            histogram[d] += 1
+        person_id = graph.person_ids[p]
+        writer.writerow([person_id, degrees.people[person_id]["name"],
+                         d if d >= 0 else ""])
+    return histogram
+
+
+def print_histogram(histogram, file=sys.stderr):
+    total = sum(histogram.values())
+    print("degrees      count   share", file=file)
+    for d in sorted(histogram):
+        label = "unreachable" if d == -1 else str(d)
+        print(f"{label:<11}{histogram[d]:>7}{histogram[d] / total:>8.2%}", file=file)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Degrees of separation statistics over many sources.")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--center", metavar="NAME",
+                        help="distance of everyone from this person")
+    parser.add_argument("--sources", type=int, metavar="N",
+                        help="sample N source people instead of using everyone")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--out", metavar="FILE", help="CSV output, stdout by default")
+    parser.add_argument("--histogram", metavar="FILE",
+                        help="also write the histogram as CSV")
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    global graph
+    print("Loading data...", file=sys.stderr)
+    degrees.load_data(args.directory)
+    graph = degrees.compact_graph()
+    print("Data loaded.", file=sys.stderr)
+
+    out = open(args.out, "w", newline="", encoding="utf-8") if args.out else sys.stdout
+    start = time.perf_counter()
+    try:
+        if args.center:
+            center = degrees.person_id_for_name(args.center)
+            if center is None:
+                sys.exit("Person not found.")
+            histogram = center_numbers(graph.person_index[center], out)
+        else:
+            sources = range(len(graph.person_ids))
+            if args.sources is not None and args.sources < len(sources):
+                sources = random.Random(args.seed).sample(sources, args.sources)
+            histogram = many_sources(list(sources), args.workers, out)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"Done in {time.perf_counter() - start:.2f}s.", file=sys.stderr)
+
+    print_histogram(histogram)
+    if args.histogram:
+        with open(args.histogram, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["degrees", "count"])
+            for d in sorted(histogram):
+                writer.writerow([d, histogram[d]])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+import mmap
+import os
+import pickle
+import struct
+from array import array
+from collections.abc import Mapping
+
+from graph import CompactGraph
+
+# Bump whenever the layout of the snapshot file changes
+SNAPSHOT_VERSION = 2
+SNAPSHOT_NAME = "degrees.snapshot"
+SOURCES = ("people.csv", "movies.csv", "stars.csv")
+MAGIC = b"DEGREES\0"
+
+# Adjacency arrays of CompactGraph stored raw so they can be mapped directly
+ARRAYS = ("person_offsets", "person_movies", "movie_offsets", "movie_stars")
+
+# Tables stored one pickled record per key, so that a lookup decodes one record
+TABLES = ("names", "people", "movies")
+
+
+def snapshot_path(directory):
+    return os.path.join(directory, SNAPSHOT_NAME)
+
+
+def source_key(directory):
+    """
+    Sizes and modification times of the CSV files, used to tell
+    whether a snapshot is still up to date.
+    """
+    key = []
+    for filename in SOURCES:
+        stat = os.stat(os.path.join(directory, filename))
+        key.append((filename, stat.st_size, stat.st_mtime_ns))
+    return tuple(key)
+
+
+def write_snapshot(directory, names, people, movies, graph):
+    """
+    Write the loaded tables and compiled graph next to the CSV files,
+    in the layout of `write_sections`. Graph arrays are stored raw and
+    each table as four raw sections: its keys sorted by their UTF-8
+    bytes, their offsets, each key's record pickled on its own and the
+    records' offsets.
+    """
+    sections = {
+        "ids": pickle.dumps((graph.person_ids, graph.movie_ids),
+                            pickle.HIGHEST_PROTOCOL),
+    }
+    for name, table in zip(TABLES, (names, people, movies)):
+        for part, values in _record_sections(table).items():
+            sections[f"{name}.{part}"] = values
+    for name in ARRAYS:
+        sections[name] = getattr(graph, name)
+    header = {"version": SNAPSHOT_VERSION, "key": source_key(directory)}
+    write_sections(snapshot_path(directory), MAGIC, header, sections)
+
+
+def write_sections(path, magic, header, sections):
+    """
+    Write a file to be memory-mapped by `map_sections`.
+
+    Layout is `magic`, a length prefixed pickled `header` to which an
+    (offset, length, typecode) entry per section is added, then the
+    sections themselves aligned to 8 bytes. Sections given as arrays are
+    stored raw with their typecode, bytes are stored as they are, with a
+    typecode of None to be unpickled.
+    """
+    # Header size depends on the offsets it holds, so grow the space
+    # reserved for it until the header fits
+    start = 0
+    while True:
+        layout = {}
+        offset = start
+        for name, data in sections.items():
+            length = len(data) * data.itemsize if isinstance(data, array) else len(data)
+            layout[name] = (offset, length, getattr(data, "typecode", None))
+            offset = _align(offset + length)
+        header_bytes = pickle.dumps({**header, "sections": layout})
+        if len(magic) + 4 + len(header_bytes) <= start:
+            break
+        start = _align(len(magic) + 4 + len(header_bytes) + 64)
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(magic)
+        f.write(struct.pack("<I", len(header_bytes)))
+        f.write(header_bytes)
+        for name, data in sections.items():
+            f.seek(layout[name][0])
+            f.write(data)
+    os.replace(tmp, path)
+
+
+def map_sections(path, magic, version, key):
+    """
+    Map a file written by `write_sections`. Returns (mapping, header),
+    or None if there is no such file, if it does not start with `magic`,
+    if its header's version or source key differ from `version` and
+    `key`, or if it is too short for the sections it lists.
+    """
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return None
+    with f:
+        try:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file
+            return None
+    if mapping[:len(magic)] != magic:
+        return None
+    start = len(magic) + 4
+    try:
+        (size,) = struct.unpack("<I", mapping[len(magic):start])
+        header = pickle.loads(mapping[start:start + size])
+        sections = header["sections"]
+    except Exception:
+        return None
+    if header.get("version") != version or header.get("key") != key:
+        return None
+    for offset, length, typecode in sections.values():
+        if offset + length > len(mapping):
+            return None
+        if typecode is not None and length % array(typecode).itemsize:
+            return None
+    return mapping, header
+
+
+def read_section(mapping, entry):
+    """
+    Section of a mapped file given its (offset, length, typecode) header
+    entry: a view cast to the typecode, or the unpickled value.
+    """
+    offset, length, typecode = entry
+    view = memoryview(mapping)[offset:offset + length]
+    if typecode is not None:
+        return view.cast(typecode)
+    return pickle.loads(view)
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def _record_sections(table):
+    keys = sorted(key.encode("utf-8") for key in table)
+    key_offsets = array("q", [0])
+    record_offsets = array("q", [0])
+    key_bytes = bytearray()
+    record_bytes = bytearray()
+    for key in keys:
+        key_bytes += key
+        key_offsets.append(len(key_bytes))
+        record_bytes += pickle.dumps(table[key.decode("utf-8")], pickle.HIGHEST_PROTOCOL)
+        record_offsets.append(len(record_bytes))
+    return {"keys": array("B", key_bytes), "key_offsets": key_offsets,
+            "records": array("B", record_bytes), "record_offsets": record_offsets}
+
+
+class Snapshot():
+    """
+    A memory-mapped snapshot file. Sections are only decoded
+    when first asked for.
+    """
+
+    def __init__(self, mapping, sections):
+        self.mapping = mapping
+        self.sections = sections
+
+    def section(self, name):
+        return read_section(self.mapping, self.sections[name])
+
+    def table(self, name):
+        return LazyTable(self, name)
+
+    def graph(self):
+        person_ids, movie_ids = self.section("ids")
+        return CompactGraph(person_ids, movie_ids,
+                            *(self.section(name) for name in ARRAYS))
+
+
+def open_snapshot(directory):
+    """
+    Map the snapshot in `directory`. Returns None if there is none, or
+    if it was written by another version or from different CSV files.
+    """
+    opened = map_sections(snapshot_path(directory), MAGIC, SNAPSHOT_VERSION,
+                          source_key(directory))
+    if opened is None:
+        return None
+    mapping, header = opened
+    return Snapshot(mapping, header["sections"])
+
+
+class LazyTable(Mapping):
+    """
+    Read-only dict stand-in over a table of the snapshot. A lookup binary
+    searches the mapped keys and unpickles only the record asked for,
+    keeping it for later lookups.
+    """
+
+    def __init__(self, snapshot, name):
+        self._keys = snapshot.section(f"{name}.keys")
+        self._key_offsets = snapshot.section(f"{name}.key_offsets")
+        self._records = snapshot.section(f"{name}.records")
+        self._record_offsets = snapshot.section(f"{name}.record_offsets")
+        self.cache = {}
+
+    def _key(self, i):
+        return bytes(self._keys[self._key_offsets[i]:self._key_offsets[i + 1]])
+
+    def _find(self, key):
+        """
+        Position of `key` among the sorted keys, or None.
+        """
+        if not isinstance(key, str):
+            return None
+        encoded = key.encode("utf-8")
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < encoded:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self) and self._key(low) == encoded:
+            return low
+        return None
+
+    def __getitem__(self, key):
+        if key in self.cache:
+            return self.cache[key]
+        i = self._find(key)
+        if i is None:
+            raise KeyError(key)
+        record = pickle.loads(self._records[self._record_offsets[i]:self._record_offsets[i + 1]])
+        self.cache[key] = record
+        return record
+
+    def __contains__(self, key):
+        return key in self.cache or self._find(key) is not None
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._key(i).decode("utf-8")
+
+    def __len__(self):
+        return len(self._key_offsets) - 1
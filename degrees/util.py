@@ -1,4 +1,4 @@
-from collections import deque
+from collections import Counter, deque
 
 
 class Node():
@@ -14,12 +14,16 @@ class Node():
 class StackFrontier():
     def __init__(self):
         self.frontier = deque()
+        # Count of nodes per state currently in the frontier,
+        # kept in step with the deque for constant time lookups
+        self.states = Counter()
 
     def add(self, node):
         self.frontier.append(node)
+        self.states[node.state] += 1
 
     def contains_state(self, state):
-        return any(node.state == state for node in self.frontier)
+        return state in self.states
 
     def empty(self):
         return len(self.frontier) == 0
@@ -29,8 +33,14 @@ class StackFrontier():
             raise Exception("empty frontier")
         else:
             node = self.frontier.pop()
+            self._forget(node)
             return node
 
+    def _forget(self, node):
+        self.states[node.state] -= 1
+        if not self.states[node.state]:
+            del self.states[node.state]
+
 
 class QueueFrontier(StackFrontier):
 
@@ -39,4 +49,5 @@ class QueueFrontier(StackFrontier):
             raise Exception("empty frontier")
         else:
             node = self.frontier.popleft()
+            self._forget(node)
             return node
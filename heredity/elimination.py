@@ -0,0 +1,196 @@
+import heapq
+import itertools
+
+from heredity import TABLES
+
+GENES = (0, 1, 2)
+
+
+class Factor():
+    """
+    Nonnegative function of the gene counts of some people. `table` maps
+    each tuple of gene counts, in the order of `variables`, to a value.
+    """
+
+    def __init__(self, variables, table):
+        self.variables = tuple(variables)
+        self.table = table
+
+    def __mul__(self, other):
+        variables = self.variables + tuple(v for v in other.variables if v not in self.variables)
+        table = {}
+        for values in itertools.product(GENES, repeat=len(variables)):
+            assignment = dict(zip(variables, values))
+            table[values] = (self.table[tuple(assignment[v] for v in self.variables)] *
+                             other.table[tuple(assignment[v] for v in other.variables)])
+        return Factor(variables, table)
+
+    def keep(self, variables):
+        """
+        Sum out every variable not in `variables`.
+        """
+        kept = tuple(v for v in self.variables if v in variables)
+        positions = [self.variables.index(v) for v in kept]
+        table = dict.fromkeys(itertools.product(GENES, repeat=len(kept)), 0)
+        for values, p in self.table.items():
+            table[tuple(values[i] for i in positions)] += p
+        return Factor(kept, table)
+
+    def normalized(self):
+        total = sum(self.table.values())
+        return Factor(self.variables, {values: p / total for values, p in self.table.items()})
+
+
+def person_factors(people, person, tables):
+    """
+    Factors one person contributes to the network: their gene count given
+    their parents' (or unconditionally), times the likelihood of their
+    trait if it is known.
+    """
+    info = people[person]
+    trait = info["trait"]
+    evidence = {g: tables.trait[g][trait] if trait is not None else 1 for g in GENES}
+    if not info["mother"]:
+        return [Factor((person,), {(g,): tables.gene[g] * evidence[g] for g in GENES})]
+    inheritance = Factor((person, info["mother"], info["father"]), {
+        (g, m, f): tables.child[g][m][f] for g, m, f in itertools.product(GENES, repeat=3)
+    })
+    return [inheritance, Factor((person,), {(g,): evidence[g] for g in GENES})]
+
+
+def elimination_order(factors, variables):
+    """
+    Greedy order eliminating at each step the variable with the fewest
+    neighbours in the moral graph, breaking ties by fill-in. On pedigrees
+    without loops this keeps every cluster to a person and their parents.
+    """
+    neighbours = {v: set() for v in variables}
+    for factor in factors:
+        for v in factor.variables:
+            neighbours[v].update(factor.variables)
+            neighbours[v].discard(v)
+
+    def cost(v):
+        others = list(neighbours[v])
+        fill = sum(1 for a, b in itertools.combinations(others, 2) if b not in neighbours[a])
+        return len(others), fill
+
+    # Costs only change around an eliminated variable, so stale heap
+    # entries are skipped instead of rescanning every variable
+    costs = {v: cost(v) for v in neighbours}
+    heap = [(c, i, v) for i, (v, c) in enumerate(costs.items())]
+    heapq.heapify(heap)
+    order = []
+    while heap:
+        c, i, v = heapq.heappop(heap)
+        if v not in neighbours or costs[v] != c:
+            continue
+        affected = neighbours.pop(v)
+        for a in affected:
+            neighbours[a].update(affected - {a})
+            neighbours[a].discard(v)
+        for a in {b for a in affected for b in neighbours[a]} | affected:
+            costs[a] = cost(a)
+            heapq.heappush(heap, (costs[a], i, a))
+        order.append(v)
+    return order
+
+
+class JunctionTree():
+    """
+    Clusters formed by eliminating the gene variables in order. Cluster i
+    holds the i-th eliminated person and their neighbours at that point;
+    its parent is the cluster of the next of those to be eliminated.
+    Every factor is attached to the cluster of its first eliminated person.
+    """
+
+    def __init__(self, factors, order):
+        position = {v: i for i, v in enumerate(order)}
+        neighbours = {v: set() for v in order}
+        for factor in factors:
+            for v in factor.variables:
+                neighbours[v].update(factor.variables)
+        self.clusters = []
+        self.parent = []
+        for v in order:
+            cluster = neighbours[v] | {v}
+            self.clusters.append(cluster)
+            for a in cluster:
+                neighbours[a].update(cluster)
+            rest = cluster - {v}
+            for a in rest:
+                neighbours[a].discard(v)
+            self.parent.append(min((position[a] for a in rest), default=None))
+        self.children = [[] for _ in order]
+        for i, parent in enumerate(self.parent):
+            if parent is not None:
+                self.children[parent].append(i)
+        self.potentials = [Factor((v,), {(g,): 1 for g in GENES}) for v in order]
+        for factor in factors:
+            i = min(position[v] for v in factor.variables)
+            self.potentials[i] = self.potentials[i] * factor
+
+    def calibrate(self):
+        """
+        Two passes of sum-product messages, up to the roots in elimination
+        order and back down. Returns each cluster's belief, proportional
+        to the joint distribution of its people and the evidence. Messages
+        are rescaled to sum to 1 so that large families do not underflow.
+        """
+        n = len(self.clusters)
+        up = [None] * n
+        for i in range(n):
+            belief = self.potentials[i]
+            for child in self.children[i]:
+                belief = belief * up[child]
+            if self.parent[i] is not None:
+                up[i] = belief.keep(self.clusters[i] & self.clusters[self.parent[i]]).normalized()
+        down = [None] * n
+        beliefs = [None] * n
+        for i in reversed(range(n)):
+            belief = self.potentials[i]
+            if self.parent[i] is not None:
+                belief = belief * down[i]
+            for child in self.children[i]:
+                belief = belief * up[child]
+            beliefs[i] = belief
+            for child in self.children[i]:
+                # Divide out the child's own message by recomputing without it
+                message = self.potentials[i]
+                if self.parent[i] is not None:
+                    message = message * down[i]
+                for other in self.children[i]:
+                    if other != child:
+                        message = message * up[other]
+                down[child] = message.keep(self.clusters[i] & self.clusters[child]).normalized()
+        return beliefs
+
+
+def eliminate(people, tables=None):
+    """
+    Exact gene and trait distributions for every person, in the layout
+    `main` prints, by message passing over the family's Bayesian network
+    instead of enumerating every assignment. Cost grows linearly with
+    the number of people when the family tree has no loops.
+    Probabilities come from `tables`, by default those of PROBS.
+    """
+    tables = tables or TABLES
+    factors = [factor for person in people for factor in person_factors(people, person, tables)]
+    order = elimination_order(factors, people)
+    tree = JunctionTree(factors, order)
+    beliefs = tree.calibrate()
+    probabilities = {}
+    for i, person in enumerate(order):
+        marginal = beliefs[i].keep({person}).table
+        total = sum(marginal.values())
+        genes = {g: marginal[(g,)] / total for g in GENES}
+        trait = people[person]["trait"]
+        if trait is None:
+            has_trait = sum(genes[g] * tables.trait[g][True] for g in GENES)
+        else:
+            has_trait = 1.0 if trait else 0.0
+        probabilities[person] = {
+            "gene": {2: genes[2], 1: genes[1], 0: genes[0]},
+            "trait": {True: has_trait, False: 1 - has_trait},
+        }
+    return {person: probabilities[person] for person in people}
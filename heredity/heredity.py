@@ -1,6 +1,7 @@
+import argparse
 import csv
 import itertools
-import sys
+import json
 from pprint import pprint
 PROBS: dict[str, dict | str] = {
 
@@ -43,13 +44,169 @@ def printd(*xargs, **kwargs):
         print(*xargs, **kwargs)
 
 
+class InheritanceTables():
+    """
+    Conditional probability tables compiled once from a dictionary laid
+    out like PROBS, so that other configurations can be evaluated by
+    passing different tables to the engines.
+
+    `gene[g]` is the unconditional probability of g copies of the gene,
+    `trait[g][has_trait]` the probability of the trait given g copies and
+    `child[g][mother][father]` the probability of a child having g copies
+    given the parents' counts.
+    """
+
+    def __init__(self, probs: dict):
+        mutation = probs["mutation"]
+        self.gene = {g: probs["gene"][g] for g in (0, 1, 2)}
+        self.trait = {g: {t: probs["trait"][g][t] for t in (True, False)} for g in (0, 1, 2)}
+        # Probability that a parent with this many copies passes one on
+        passes = {0: mutation, 1: 0.5, 2: 1 - mutation}
+        self.child = [[[0.0] * 3 for _ in range(3)] for _ in range(3)]
+        for mother in (0, 1, 2):
+            for father in (0, 1, 2):
+                pm, pf = passes[mother], passes[father]
+                self.child[0][mother][father] = (1 - pm) * (1 - pf)
+                self.child[1][mother][father] = pm * (1 - pf) + (1 - pm) * pf
+                self.child[2][mother][father] = pm * pf
+
+
+# Tables of the default configuration
+TABLES = InheritanceTables(PROBS)
+
+
+def load_probs(filename) -> dict:
+    """
+    Load a PROBS-style configuration from a JSON file, whose object keys
+    are strings: gene counts "0", "1", "2" and traits "true", "false".
+    Every probability must be a number between 0 and 1, and the gene
+    counts, as well as each gene count's traits, must sum to 1.
+    """
+    with open(filename) as f:
+        data = json.load(f)
+
+    def expect(keys, wanted, where):
+        if not isinstance(keys, dict):
+            raise ValueError(f"{filename}: {where} must be an object with keys "
+                             f"{', '.join(wanted)}, got {json.dumps(keys)}")
+        if set(keys) != set(wanted):
+            raise ValueError(f"{filename}: {where} needs keys {', '.join(wanted)}, "
+                             f"got {', '.join(map(str, keys)) or 'none'}")
+
+    counts = ("0", "1", "2")
+    expect(data, ("gene", "trait", "mutation"), "the configuration")
+    expect(data["gene"], counts, '"gene"')
+    expect(data["trait"], counts, '"trait"')
+    for g, traits in data["trait"].items():
+        expect(traits, ("true", "false"), f'"trait" "{g}"')
+
+    def probability(p, where):
+        if isinstance(p, bool) or not isinstance(p, (int, float)) or not 0 <= p <= 1:
+            raise ValueError(f"{filename}: {where} must be a probability between 0 and 1, "
+                             f"got {json.dumps(p)}")
+
+    for g, p in data["gene"].items():
+        probability(p, f'"gene" "{g}"')
+    for g, traits in data["trait"].items():
+        for t, p in traits.items():
+            probability(p, f'"trait" "{g}" "{t}"')
+    probability(data["mutation"], '"mutation"')
+
+    def distribution(ps, where):
+        if abs(sum(ps.values()) - 1) > 1e-6:
+            raise ValueError(f"{filename}: {where} must sum to 1, got {sum(ps.values()):g}")
+
+    distribution(data["gene"], '"gene"')
+    for g, traits in data["trait"].items():
+        distribution(traits, f'"trait" "{g}"')
+    return {
+        "gene": {int(g): p for g, p in data["gene"].items()},
+        "trait": {int(g): {t == "true": p for t, p in traits.items()}
+                  for g, traits in data["trait"].items()},
+        "mutation": data["mutation"],
+    }
+
+
 def main():
-    # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
-    people = load_data(sys.argv[1])
+    parser = argparse.ArgumentParser(
+        usage="python heredity.py data.csv [--engine ENGINE] [--probs FILE] "
+              "[--samples N] [--time SECONDS] [--workers N] [--seed N]")
+    parser.add_argument("data", help="CSV of name, mother, father, trait")
+    parser.add_argument("--engine", default="enumerate",
+                        choices=("enumerate", "vectorized", "eliminate", "likelihood", "gibbs"),
+                        help="enumerate every assignment, one by one or in NumPy batches, "
+                             "run exact message passing that scales to large families, "
+                             "or estimate by likelihood weighting or Gibbs sampling")
+    parser.add_argument("--probs", metavar="FILE",
+                        help="JSON file of gene, trait and mutation probabilities "
+                             "to use instead of PROBS")
+    # Defaults of the sampling options are filled in after parsing, so
+    # that they are rejected for the exact engines only when given
+    parser.add_argument("--samples", type=int,
+                        help="sample budget of the sampling engines, 100000 by default")
+    parser.add_argument("--time", type=float, metavar="SECONDS",
+                        help="stop the sampling engines after about this long")
+    parser.add_argument("--workers", type=int,
+                        help="processes the sampling engines use, all CPUs by default")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    if args.engine in ("likelihood", "gibbs"):
+        if args.samples is not None and args.samples < 1:
+            parser.error("--samples must be at least 1")
+        if args.time is not None and args.time <= 0:
+            parser.error("--time must be positive")
+        if args.workers is not None and args.workers < 1:
+            parser.error("--workers must be at least 1")
+    else:
+        given = [option for option, value in (("--samples", args.samples), ("--time", args.time),
+                                              ("--workers", args.workers), ("--seed", args.seed))
+                 if value is not None]
+        if given:
+            parser.error(f"the {args.engine} engine is exact and ignores {', '.join(given)}")
+    args.samples = 100000 if args.samples is None else args.samples
+    tables = TABLES
+    if args.probs:
+        try:
+            tables = InheritanceTables(load_probs(args.probs))
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+    people = load_data(args.data)
     if DEBUG:
         pprint(people, sort_dicts=False)
+    if args.engine == "eliminate":
+        from elimination import eliminate
+        probabilities = eliminate(people, tables)
+    elif args.engine == "vectorized":
+        # NumPy is only needed for this engine
+        from vectorized import vectorized_probabilities
+        probabilities = vectorized_probabilities(people, tables)
+    elif args.engine in ("likelihood", "gibbs"):
+        from sampling import sample_probabilities
+        probabilities, errors, samples = sample_probabilities(
+            people, args.engine, tables, args.samples, args.time, args.workers, seed=args.seed)
+    else:
+        probabilities = enumerate_probabilities(people, tables)
+
+    # Print results
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                print(f"    {value}: {p:.4f}")
+    if args.engine in ("likelihood", "gibbs"):
+        error = max(e for person in errors.values() for field in person.values()
+                    for e in field.values())
+        print(f"Estimated from {samples} samples, largest standard error {error:.4f}")
+
+
+def enumerate_probabilities(people, tables=None):
+    """
+    Gene and trait distributions for every person, summing the joint
+    probability of every assignment consistent with the known traits.
+    Probabilities come from `tables`, by default those of PROBS.
+    """
     # Keep track of gene and trait probabilities for each person
     probabilities = {
         person: {
@@ -65,40 +222,26 @@ def main():
         }
         for person in people
     }
-    # Loop over all sets of people who might have the trait
+    # Loop over the sets of people who might have the trait that agree
+    # with known information: only people with unknown traits vary
     names = set(people)
-    for have_trait in powerset(names):
-
-        # Check if current set of people violates known information
-        fails_evidence = any(
-            (people[person]["trait"] is not None and
-             people[person]["trait"] != (person in have_trait))
-            for person in names
-        )
-        if fails_evidence:
-            continue
+    known = {person for person in names if people[person]["trait"]}
+    unknown = {person for person in names if people[person]["trait"] is None}
+    for subset in powerset(unknown):
+        have_trait = known | subset
 
         # Loop over all sets of people who might have the gene
-        for one_gene in powerset(names):
-            for two_genes in powerset(names - one_gene):
+        for one_gene, two_genes in gene_assignments(names):
 
-                # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
-                update(probabilities, one_gene, two_genes, have_trait, p)
+            # Update probabilities with new joint probability
+            p = joint_probability(people, one_gene, two_genes, have_trait, tables)
+            update(probabilities, one_gene, two_genes, have_trait, p)
     if DEBUG:
         print("before normalise:")
         pprint(probabilities)
     # Ensure probabilities sum to 1
     normalize(probabilities)
-
-    # Print results
-    for person in people:
-        print(f"{person}:")
-        for field in probabilities[person]:
-            print(f"  {field.capitalize()}:")
-            for value in probabilities[person][field]:
-                p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
+    return probabilities
 
 
 def load_data(filename) -> dict[str, str | None | bool]:
@@ -125,17 +268,27 @@ def load_data(filename) -> dict[str, str | None | bool]:
 
 def powerset(s: set[str]):
     """
-    Return a list of all possible subsets of set s.
+    Yield every possible subset of set s, one at a time.
     """
     s = list(s)
-    return [
-        set(s) for s in itertools.chain.from_iterable(
-            itertools.combinations(s, r) for r in range(len(s) + 1)
-        )
-    ]
+    for subset in itertools.chain.from_iterable(
+        itertools.combinations(s, r) for r in range(len(s) + 1)
+    ):
+        yield set(subset)
+
+
+def gene_assignments(names: set[str]):
+    """
+    Yield every split of `names` into (one_gene, two_genes), the sets of
+    people with one and two copies of the gene, one at a time.
+    """
+    for one_gene in powerset(names):
+        for two_genes in powerset(names - one_gene):
+            yield one_gene, two_genes
 
 
-def joint_probability(people: dict[str], one_gene: set[str], two_genes: set[str], have_trait: set[str]) -> float:
+def joint_probability(people: dict[str], one_gene: set[str], two_genes: set[str], have_trait: set[str],
+                      tables: InheritanceTables | None = None) -> float:
     """
     Compute and return a joint probability.
 
@@ -145,17 +298,19 @@ def joint_probability(people: dict[str], one_gene: set[str], two_genes: set[str]
         * everyone not in `one_gene` or `two_gene` does not have the gene, and
         * everyone in set `have_trait` has the trait, and
         * everyone not in set` have_trait` does not have the trait.
+
+    Probabilities come from `tables`, by default those of PROBS.
     """
+    tables = tables or TABLES
     ma = 1
     for person in people:
-        person_prob = 1
         num_genes = 2 if person in two_genes else 1 if person in one_gene else 0
-        person_prob *= PROBS["trait"][num_genes][person in have_trait]
+        person_prob = tables.trait[num_genes][person in have_trait]
 
-        if not people[person]["mother"]:
-            person_prob *= PROBS["gene"][num_genes]
+        mother = people[person]["mother"]
+        if not mother:
+            person_prob *= tables.gene[num_genes]
         else:
-            mother = people[person]["mother"]
             father = people[person]["father"]
 
             father_genes = 2 if father in two_genes else 1 if father in one_gene else 0
@@ -163,48 +318,11 @@ def joint_probability(people: dict[str], one_gene: set[str], two_genes: set[str]
             printd("no {trait,parent}" +
                    f": C:{num_genes}, M:{mother_genes} ,F:{father_genes}")
 
-            if num_genes == 1:  # yes father no mother
-                person_prob *= get_prob.mut1(mother_genes=mother_genes,
-                                             father_genes=father_genes)
-            else:
-                person_prob *= get_prob.mut(num_genes, father_genes)
-                person_prob *= get_prob.mut(num_genes, mother_genes)
+            person_prob *= tables.child[num_genes][mother_genes][father_genes]
         ma *= person_prob
     return ma
 
 
-class get_prob():
-
-    @staticmethod
-    def wanted(a: bool, b: bool) -> float:
-        """ a and b are infected genes of parent"""
-        return sum(((1-PROBS["mutation"]) if x else PROBS["mutation"]) for x in [a, b])/2
-
-    @staticmethod
-    def mut(self_genes: int, parent_genes: int):
-        """
-        for mut 0:
-        if father 0:  1-mutation = 0.5*1*(1-mutation) + 0.5*1*(1-mutation)
-        if father 1:  0.5*1*(1-mutation) + 0.5*1*mutaion
-        if father 2:  mutation = 0.5*1*mutation + 0.5*1*mutaion
-        """
-        assert self_genes in (0, 2)
-        a, b = parent_genes >= 1, parent_genes >= 2
-        return get_prob.wanted(not a, not b) if self_genes == 0 else get_prob.wanted(a, b)
-
-    @staticmethod
-    def mut1(mother_genes: int, father_genes: int):
-        # father and not mother, or viceversa
-        pr = 0
-        fa, fb = father_genes >= 1, father_genes >= 2
-        ma, mb = mother_genes >= 1, mother_genes >= 2
-
-        pr += get_prob.wanted(fa, fb)*get_prob.wanted(not ma, not mb)
-        pr += get_prob.wanted(not fa, not fb)*get_prob.wanted(ma, mb)
-
-        return pr
-
-
 def update(probabilities: dict, one_gene: set[str], two_genes: set[str], have_trait: set[str], p):
     """
     Add to `probabilities` a new joint probability `p`.
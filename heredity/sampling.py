@@ -0,0 +1,310 @@
+import math
+import os
+import random
+import time
+from multiprocessing import Pool
+
+from heredity import TABLES
+
+# Pedigree being sampled and its tables, set in each pool worker by `_init_worker`
+_pedigree = None
+_tables = None
+
+
+class Pedigree():
+    """
+    A family indexed for sampling. People are numbered so that parents
+    come before their children. `mother[i]` and `father[i]` are indices
+    or None, `evidence[i][g]` is the likelihood of person i's known trait
+    given g copies of the gene (1 if unknown), `children[i]` lists
+    (child, mother, father) for every child of person i and `blocks[i]`
+    the children the Gibbs sampler redraws together with person i.
+    """
+
+    def __init__(self, people, tables):
+        self.names = []
+        seen = set()
+
+        def visit(name):
+            if name in seen:
+                return
+            seen.add(name)
+            for parent in (people[name]["mother"], people[name]["father"]):
+                if parent:
+                    visit(parent)
+            self.names.append(name)
+
+        for name in people:
+            visit(name)
+        index = {name: i for i, name in enumerate(self.names)}
+        self.mother = [index.get(people[name]["mother"]) for name in self.names]
+        self.father = [index.get(people[name]["father"]) for name in self.names]
+        self.trait = [people[name]["trait"] for name in self.names]
+        self.evidence = [[tables.trait[g][trait] if trait is not None else 1 for g in (0, 1, 2)]
+                         for trait in self.trait]
+        self.children = [[] for _ in self.names]
+        for child, (mother, father) in enumerate(zip(self.mother, self.father)):
+            if mother is not None:
+                self.children[mother].append((child, mother, father))
+                self.children[father].append((child, mother, father))
+        self.blocks = [self._block(i) for i in range(len(self.names))]
+        # Children of person i whose inheritance involves no one in i's block
+        self.free_children = [
+            [(child, mother, father) for child, mother, father in self.children[i]
+             if child not in block and (father if mother == i else mother) not in block]
+            for i, block in enumerate(self.blocks)
+        ]
+
+    def _block(self, i):
+        """
+        Children of person i that can be redrawn together with them. Given
+        everyone else, each must depend on person i alone: no child in the
+        block may be the partner of another or share a partner with one.
+        """
+        block = []
+        related = set()
+        for child, mother, father in self.children[i]:
+            partners = {father if mother == i else mother}
+            partners |= {m if f == child else f for _, m, f in self.children[child]}
+            partners.discard(i)
+            if child in related or partners & set(block):
+                continue
+            block.append(child)
+            related |= partners
+        return tuple(block)
+
+    def __len__(self):
+        return len(self.names)
+
+
+def _choose(weights, total, rng):
+    r = rng.random() * total
+    for g, weight in enumerate(weights):
+        r -= weight
+        if r < 0:
+            return g
+    return len(weights) - 1
+
+
+def likelihood_weighting(pedigree, tables, n, rng=random):
+    """
+    Draw `n` gene assignments parents first from the prior and inheritance
+    tables, each weighted by the likelihood of the known traits.
+
+    Returns (log scale, total weight, gene sums, trait sums) where the
+    weights are relative to exp(log scale), to keep families with many
+    known traits from underflowing. Samples the known traits rule out
+    weigh nothing and are left out. gene_sums[i][g] is the weight of
+    samples giving person i g copies and trait_sums[i] the weighted
+    probability of person i having the trait.
+    """
+    people = len(pedigree)
+    gene = [tables.gene[g] for g in (0, 1, 2)]
+    has_trait = [tables.trait[g][True] for g in (0, 1, 2)]
+    scale = -math.inf
+    total = 0.0
+    gene_sums = [[0.0] * 3 for _ in range(people)]
+    trait_sums = [0.0] * people
+    genes = [0] * people
+    for _ in range(n):
+        log_weight = 0.0
+        for i in range(people):
+            mother, father = pedigree.mother[i], pedigree.father[i]
+            if mother is None:
+                g = _choose(gene, 1, rng)
+            else:
+                g = _choose([tables.child[c][genes[mother]][genes[father]] for c in (0, 1, 2)],
+                            1, rng)
+            genes[i] = g
+            if pedigree.trait[i] is not None:
+                if pedigree.evidence[i][g] == 0:
+                    log_weight = -math.inf
+                    break
+                log_weight += math.log(pedigree.evidence[i][g])
+        if log_weight == -math.inf:
+            continue
+        if log_weight > scale:
+            # Rescale what was accumulated so far to the new largest weight
+            shrink = math.exp(scale - log_weight)
+            total *= shrink
+            for i in range(people):
+                trait_sums[i] *= shrink
+                gene_sums[i] = [s * shrink for s in gene_sums[i]]
+            scale = log_weight
+        weight = math.exp(log_weight - scale)
+        total += weight
+        for i, g in enumerate(genes):
+            gene_sums[i][g] += weight
+            trait_sums[i] += weight * has_trait[g]
+    return scale, total, gene_sums, trait_sums
+
+
+def gibbs(pedigree, tables, n, burn_in=1000, rng=random, start=None):
+    """
+    Blocked Gibbs sampler over gene counts: each step redraws one person's
+    gene count together with those of the children in their block, given
+    everyone else. Mutation is rare, so a child's count is nearly fixed by
+    its parents' and redrawing people one at a time would barely move.
+
+    Continues from the gene counts `start` or else starts from a draw
+    from the prior and discards `burn_in` sweeps. Then averages each
+    person's conditional distribution over `n` sweeps rather than the
+    drawn values, which gives lower variance. Returns the same tuple as
+    `likelihood_weighting`, with every sweep weighing 1, followed by the
+    last gene counts to continue the chain from.
+    """
+    people = len(pedigree)
+    has_trait = [tables.trait[g][True] for g in (0, 1, 2)]
+    genes = [0] * people
+
+    def inheritance(i):
+        mother, father = pedigree.mother[i], pedigree.father[i]
+        if mother is None:
+            return tables.gene[genes[i]]
+        return tables.child[genes[i]][genes[mother]][genes[father]]
+
+    def own(i):
+        return inheritance(i) * pedigree.evidence[i][genes[i]]
+
+    if start is not None:
+        genes[:] = start
+        burn_in = 0
+    else:
+        for i in range(people):
+            mother, father = pedigree.mother[i], pedigree.father[i]
+            if mother is None:
+                weights = [tables.gene[g] for g in (0, 1, 2)]
+            else:
+                weights = [tables.child[g][genes[mother]][genes[father]] for g in (0, 1, 2)]
+            genes[i] = _choose(weights, 1, rng)
+
+    gene_sums = [[0.0] * 3 for _ in range(people)]
+    trait_sums = [0.0] * people
+    for sweep in range(burn_in + n):
+        for i in range(people):
+            block = pedigree.blocks[i]
+            weights = [0.0] * 3
+            # Weights of each block child's gene counts, per count of person i
+            child_weights = [None] * 3
+            for g in (0, 1, 2):
+                genes[i] = g
+                weight = own(i)
+                for child, _, _ in pedigree.free_children[i]:
+                    weight *= inheritance(child)
+                child_weights[g] = []
+                for child in block:
+                    counts = []
+                    for c in (0, 1, 2):
+                        genes[child] = c
+                        p = own(child)
+                        for grandchild, _, _ in pedigree.children[child]:
+                            p *= inheritance(grandchild)
+                        counts.append(p)
+                    child_weights[g].append(counts)
+                    weight *= sum(counts)
+                weights[g] = weight
+            total = sum(weights)
+            if total == 0:
+                # Only while leaving a start the known traits rule out:
+                # no count of person i fits everyone else, so pick any
+                weights = [1.0] * 3
+                total = 3.0
+            genes[i] = _choose(weights, total, rng)
+            for child, counts in zip(block, child_weights[genes[i]]):
+                genes[child] = _choose(counts, sum(counts), rng)
+            if sweep >= burn_in:
+                for g in (0, 1, 2):
+                    gene_sums[i][g] += weights[g] / total
+                    trait_sums[i] += weights[g] / total * has_trait[g]
+    return 0.0, float(n), gene_sums, trait_sums, genes
+
+
+def _init_worker(pedigree, tables):
+    global _pedigree, _tables
+    _pedigree = pedigree
+    _tables = tables
+
+
+def _sample_batch(args):
+    method, n, burn_in, seed, state = args
+    rng = random.Random(seed)
+    if method == "gibbs":
+        return gibbs(_pedigree, _tables, n, burn_in, rng, state)
+    return likelihood_weighting(_pedigree, _tables, n, rng) + (None,)
+
+
+def sample_probabilities(people, method="gibbs", tables=None, samples=100000,
+                         time_limit=None, workers=None, batch=1000, burn_in=1000,
+                         seed=None, progress=None):
+    """
+    Approximate gene and trait distributions for every person, in the
+    layout `main` prints, for families too large or too inbred for the
+    exact engines.
+
+    `method` is "likelihood" (likelihood weighting) or "gibbs". Batches
+    of `batch` samples run across a process pool until `samples` have
+    been drawn or `time_limit` seconds have passed. Each worker runs one
+    Gibbs chain, discarding `burn_in` sweeps once and carrying on from
+    batch to batch. Standard errors come from the spread of the batch
+    estimates (batch means), so there are always at least two batches.
+    `progress`, if given, is called after each round of batches with
+    the samples so far.
+
+    Returns (probabilities, errors, samples) where errors has the layout
+    of probabilities and holds the standard error of each estimate.
+    """
+    pedigree = Pedigree(people, tables or TABLES)
+    workers = workers or os.cpu_count()
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    batches = []
+    # Where each worker's Gibbs chain stopped
+    states = [None] * workers
+    with Pool(workers, initializer=_init_worker, initargs=(pedigree, tables or TABLES)) as pool:
+        while (len(batches) < 2 or
+               len(batches) * batch < samples and
+               (time_limit is None or time.perf_counter() - start < time_limit)):
+            jobs = [(method, batch, burn_in, rng.getrandbits(64), state) for state in states]
+            results = pool.map(_sample_batch, jobs)
+            states = [result[4] for result in results]
+            batches.extend(results)
+            if progress is not None:
+                progress(len(batches) * batch)
+
+    # Weight of each batch relative to the heaviest, then weighted batch means
+    scale = max(batch_scale for batch_scale, *_ in batches)
+    weights = [total * math.exp(batch_scale - scale) if total else 0.0
+               for batch_scale, total, *_ in batches]
+    total = sum(weights)
+    if total == 0:
+        raise ValueError("no sample agrees with the known traits, "
+                         "which these probabilities may rule out")
+
+    def estimate(value):
+        """
+        Weighted mean and standard error of a per batch sum picked by `value`.
+        """
+        means = [value(result) / result[1] if result[1] else 0.0 for result in batches]
+        mean = sum(w * m for w, m in zip(weights, means)) / total
+        spread = sum((w * (m - mean)) ** 2 for w, m in zip(weights, means))
+        return mean, math.sqrt(spread * len(batches) / (len(batches) - 1)) / total
+
+    probabilities = {}
+    errors = {}
+    for i, name in enumerate(pedigree.names):
+        genes = {g: estimate(lambda result: result[2][i][g]) for g in (2, 1, 0)}
+        if pedigree.trait[i] is None:
+            has_trait, error = estimate(lambda result: result[3][i])
+        else:
+            has_trait, error = float(pedigree.trait[i]), 0.0
+        probabilities[name] = {
+            "gene": {g: genes[g][0] for g in genes},
+            "trait": {True: has_trait, False: 1 - has_trait},
+        }
+        errors[name] = {
+            "gene": {g: genes[g][1] for g in genes},
+            "trait": {True: error, False: error},
+        }
+    order = list(people)
+    return ({name: probabilities[name] for name in order},
+            {name: errors[name] for name in order}, len(batches) * batch)
@@ -0,0 +1,72 @@
+import numpy as np
+
+from elimination import GENES
+from heredity import TABLES
+
+# Gene assignments evaluated per batch, bounding memory to a few arrays
+# of this many rows
+BATCH = 1 << 16
+
+
+def lookup_arrays(tables):
+    """
+    InheritanceTables as arrays: the unconditional gene distribution, the
+    child gene distribution indexed [child, mother, father] and the trait
+    distribution indexed [genes, has trait].
+    """
+    prior = np.array([tables.gene[g] for g in GENES])
+    inheritance = np.array(tables.child)
+    trait = np.array([[tables.trait[g][False], tables.trait[g][True]] for g in GENES])
+    return prior, inheritance, trait
+
+
+def vectorized_probabilities(people, tables=None, batch=BATCH):
+    """
+    Same distributions as `enumerate_probabilities`, evaluating gene
+    assignments in batches. Assignment number c gives person i the i-th
+    base 3 digit of c copies of the gene, so a batch is a range of
+    integers decoded into a (batch x people) array, and every factor of
+    the joint probability is a table lookup over a whole column.
+
+    Summing out the traits nobody observed leaves, per gene assignment,
+    the probability of the genes times the likelihood of the known
+    traits; marginals are weighted counts of each person's gene count,
+    and a person's chance of an unobserved trait is the weighted mean of
+    their trait probability given their genes.
+    Probabilities come from `tables`, by default those of PROBS.
+    """
+    prior, inheritance, trait = lookup_arrays(tables or TABLES)
+    names = list(people)
+    index = {name: i for i, name in enumerate(names)}
+    n = len(names)
+    digits = 3 ** np.arange(n, dtype=np.int64)
+
+    gene_totals = np.zeros((n, 3))
+    trait_totals = np.zeros(n)
+    for first in range(0, 3 ** n, batch):
+        codes = np.arange(first, min(first + batch, 3 ** n), dtype=np.int64)
+        genes = (codes[:, None] // digits) % 3
+        weights = np.ones(len(codes))
+        for i, name in enumerate(names):
+            person = people[name]
+            if person["mother"]:
+                weights *= inheritance[genes[:, i], genes[:, index[person["mother"]]],
+                                       genes[:, index[person["father"]]]]
+            else:
+                weights *= prior[genes[:, i]]
+            if person["trait"] is not None:
+                weights *= trait[genes[:, i], int(person["trait"])]
+        for i in range(n):
+            gene_totals[i] += np.bincount(genes[:, i], weights=weights, minlength=3)
+        trait_totals += weights @ trait[genes, 1]
+
+    probabilities = {}
+    for i, name in enumerate(names):
+        total = gene_totals[i].sum()
+        known = people[name]["trait"]
+        has_trait = trait_totals[i] / total if known is None else float(known)
+        probabilities[name] = {
+            "gene": {g: float(gene_totals[i][g] / total) for g in (2, 1, 0)},
+            "trait": {True: has_trait, False: 1 - has_trait},
+        }
+    return probabilities
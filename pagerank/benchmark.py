@@ -0,0 +1,242 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from crawler import save_corpus
+from pagerank import DAMPING, SAMPLES, crawl, iterate_pagerank, sample_pagerank, transition_model
+from sampling import fast_sample_pagerank
+
+
+def synthetic_corpus(n, links_per_page=5, seed=0):
+    """
+    Random corpus of `n` pages named 0.html, 1.html, ... whose links
+    favour already popular pages, giving a skewed in-degree distribution.
+    """
+    rng = random.Random(seed)
+    pages = [f"{i}.html" for i in range(n)]
+    corpus = {page: set() for page in pages}
+    # Every link target is added here, so choosing from it is
+    # choosing proportionally to in-degree + 1
+    popular = list(pages)
+    for page in pages:
+        for _ in range(rng.randint(0, 2 * links_per_page)):
+            link = rng.choice(popular)
+            if link != page and link not in corpus[page]:
+                corpus[page].add(link)
+                popular.append(link)
+    return corpus
+
+
+def write_html_corpus(corpus: dict[str, set[str]], directory):
+    """
+    Write a corpus as a directory of HTML pages that `crawl` reads back.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for page, links in corpus.items():
+        with open(os.path.join(directory, page), "w") as f:
+            f.write(f"<!DOCTYPE html>\n<html lang=\"en\">\n<head>\n"
+                    f"<title>{page}</title>\n</head>\n<body>\n<h1>{page}</h1>\n")
+            for link in sorted(links):
+                f.write(f"<div><a href=\"{link}\">{link}</a></div>\n")
+            f.write("</body>\n</html>\n")
+
+
+def generate(args):
+    corpus = synthetic_corpus(args.pages, args.links, args.seed)
+    write_html_corpus(corpus, args.directory)
+    print(f"Wrote {len(corpus)} pages with "
+          f"{sum(len(links) for links in corpus.values())} links to {args.directory}")
+
+
+def time_sampler(sampler, corpus, samples):
+    start = time.perf_counter()
+    ranks = sampler(corpus, DAMPING, samples)
+    return ranks, time.perf_counter() - start
+
+
+def compare_samplers(args):
+    print(f"{'pages':>8}{'model s':>10}{'fast s':>10}{'speedup':>10}{'max diff':>10}")
+    for size in args.sizes:
+        corpus = synthetic_corpus(size, seed=args.seed)
+        model, model_seconds = time_sampler(sample_pagerank, corpus, args.samples)
+        fast, fast_seconds = time_sampler(fast_sample_pagerank, corpus, args.samples)
+        diff = max(abs(model.get(page, 0) - fast.get(page, 0)) for page in corpus)
+        print(f"{size:>8}{model_seconds:>10.3f}{fast_seconds:>10.3f}"
+              f"{model_seconds / fast_seconds:>10.1f}{diff:>10.4f}")
+
+
+def compare_solvers(args):
+    """
+    Iterations and time each iterative solver needs to converge on the
+    shipped corpora and on synthetic ones, with the largest error against
+    a tightly converged reference.
+    """
+    from matrix import SOLVERS, LinkMatrix, power_iteration, solve
+
+    corpora = [(name, crawl(name)) for name in ("corpus0", "corpus1", "corpus2")]
+    corpora += [(f"synthetic-{size}", synthetic_corpus(size, seed=args.seed))
+                for size in args.sizes]
+    print(f"{'corpus':<18}{'pages':>8}{'solver':>15}{'iterations':>12}{'seconds':>10}{'max error':>12}")
+    for name, corpus in corpora:
+        links = LinkMatrix.from_corpus(corpus)
+        reference, _ = power_iteration(links, DAMPING, 1e-14, norm="l1")
+        for method in SOLVERS:
+            start = time.perf_counter()
+            ranks, iterations = solve(links, DAMPING, method, tolerance=args.tolerance,
+                                      norm=args.norm, max_iterations=args.max_iterations)
+            seconds = time.perf_counter() - start
+            error = abs(ranks - reference).max()
+            print(f"{name:<18}{len(corpus):>8}{method:>15}{iterations:>12}"
+                  f"{seconds:>10.4f}{error:>12.2e}")
+
+
+def _transition_models(corpus, args):
+    for page in corpus:
+        transition_model(corpus, page, DAMPING)
+
+
+def _sparse(corpus, args):
+    from matrix import sparse_pagerank
+    return sparse_pagerank(corpus, DAMPING)
+
+
+def _out_of_core(corpus, args):
+    from outofcore import out_of_core_pagerank
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "corpus.edges")
+        save_corpus(path, corpus)
+        pages, ranks, _ = out_of_core_pagerank(path, DAMPING)
+    return dict(zip(pages, ranks.tolist()))
+
+
+# Engines the report runs: name -> (function of corpus and arguments
+# returning ranks or None, whether its cost grows with pages squared)
+ENGINES = {
+    "transition-model": (_transition_models, True),
+    "sample": (lambda corpus, args: sample_pagerank(corpus, DAMPING, args.samples), True),
+    "fast-sample": (lambda corpus, args: fast_sample_pagerank(corpus, DAMPING, args.samples),
+                    False),
+    "iterate": (lambda corpus, args: iterate_pagerank(corpus, DAMPING), True),
+    "sparse": (_sparse, False),
+    "out-of-core": (_out_of_core, False),
+}
+
+
+def measure(function, *args, memory=True):
+    """
+    Run `function` once untraced for its wall time and, if `memory`,
+    once more under tracemalloc, which slows Python code down, for the
+    peak memory it allocates. Returns (result, seconds, peak bytes).
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    seconds = time.perf_counter() - start
+    peak = None
+    if memory:
+        tracemalloc.start()
+        function(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+def report(args):
+    """
+    Generate scale-free HTML corpora of each size, crawl them, run each
+    engine and write a JSON report with wall time, peak memory and error
+    against a tightly converged reference.
+    """
+    from matrix import LinkMatrix, power_iteration
+
+    results = []
+    for size in args.sizes:
+        corpus = synthetic_corpus(size, args.links, args.seed)
+        with tempfile.TemporaryDirectory() as directory:
+            write_html_corpus(corpus, directory)
+            corpus, seconds, peak = measure(crawl, directory, memory=args.memory)
+        row = {"pages": size, "links": sum(len(links) for links in corpus.values())}
+        results.append(dict(row, engine="crawl", seconds=seconds, peak_bytes=peak,
+                            max_error=None, l1_error=None))
+        links = LinkMatrix.from_corpus(corpus)
+        reference = links.to_dict(power_iteration(links, DAMPING, 1e-14, norm="l1")[0])
+
+        for name in args.engines:
+            function, quadratic = ENGINES[name]
+            if quadratic and size > args.quadratic_limit:
+                results.append(dict(row, engine=name, skipped=True))
+                continue
+            ranks, seconds, peak = measure(function, corpus, args, memory=args.memory)
+            errors = ([abs(ranks.get(page, 0) - reference[page]) for page in reference]
+                      if ranks is not None else None)
+            results.append(dict(row, engine=name, seconds=seconds, peak_bytes=peak,
+                                max_error=max(errors) if errors else None,
+                                l1_error=sum(errors) if errors else None))
+            print(f"{size:>8} {name:<17}{seconds:>10.3f}s", file=sys.stderr)
+
+    output = {
+        "damping_factor": DAMPING,
+        "samples": args.samples,
+        "links_per_page": args.links,
+        "seed": args.seed,
+        "python": platform.python_version(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(output, f, indent=2)
+    else:
+        json.dump(output, sys.stdout, indent=2)
+        print()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the PageRank engines on synthetic corpora.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    samplers = commands.add_parser("samplers", help="time the samplers")
+    samplers.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    samplers.add_argument("--samples", type=int, default=10000)
+    samplers.add_argument("--seed", type=int, default=0)
+    samplers.set_defaults(run=compare_samplers)
+
+    solvers = commands.add_parser("solvers", help="compare the iterative solvers")
+    solvers.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    solvers.add_argument("--tolerance", type=float, default=1e-8)
+    solvers.add_argument("--norm", choices=("max", "l1", "l2"), default="max")
+    solvers.add_argument("--max-iterations", type=int, default=1000)
+    solvers.add_argument("--seed", type=int, default=0)
+    solvers.set_defaults(run=compare_solvers)
+
+    generator = commands.add_parser("generate", help="write a synthetic HTML corpus")
+    generator.add_argument("directory")
+    generator.add_argument("--pages", type=int, default=1000)
+    generator.add_argument("--links", type=int, default=5, help="average links per page")
+    generator.add_argument("--seed", type=int, default=0)
+    generator.set_defaults(run=generate)
+
+    reporter = commands.add_parser("report", help="JSON report of every engine")
+    reporter.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    reporter.add_argument("--links", type=int, default=5, help="average links per page")
+    reporter.add_argument("--engines", nargs="+", choices=tuple(ENGINES), default=list(ENGINES))
+    reporter.add_argument("--samples", type=int, default=SAMPLES)
+    reporter.add_argument("--quadratic-limit", type=int, default=2000,
+                          help="skip engines quadratic in pages above this size")
+    reporter.add_argument("--no-memory", dest="memory", action="store_false",
+                          help="skip the traced runs that measure peak memory")
+    reporter.add_argument("--output", metavar="FILE", help="write the report here")
+    reporter.add_argument("--seed", type=int, default=0)
+    reporter.set_defaults(run=report)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import argparse
+import os
+import re
+import struct
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+LINK = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+CHUNK_SIZE = 1 << 16
+# Longest link tag carried over from one chunk to the next; a longer
+# one is not matched
+MAX_TAG = 1 << 12
+
+# Edge list file: magic, page count, length of the newline separated page
+# names, the names, then little-endian uint32 CSR arrays of
+# offsets (page count + 1) and link targets
+MAGIC = b"PREDGES1"
+
+
+def extract_links(path):
+    """
+    Return the set of link targets in an HTML file, reading it in chunks
+    rather than all at once. Matches the same links as `crawl`, except
+    for link tags longer than MAX_TAG characters.
+    """
+    links = set()
+    tail = ""
+    with open(path) as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            buffer = tail + chunk
+            end = 0
+            for match in LINK.finditer(buffer):
+                links.add(match.group(1))
+                end = match.end()
+            if not chunk:
+                return links
+            # Carry over a link tag that may be cut off by the chunk boundary,
+            # unless it is already longer than any link tag should be
+            cut = buffer.rfind("<a", max(end, len(buffer) - MAX_TAG))
+            if cut == -1 and buffer.endswith("<"):
+                cut = len(buffer) - 1
+            tail = buffer[cut:] if cut != -1 else ""
+
+
+def _page_links(args):
+    directory, filename = args
+    return extract_links(os.path.join(directory, filename))
+
+
+def list_pages(directory):
+    return sorted(filename for filename in os.listdir(directory)
+                  if filename.endswith(".html"))
+
+
+def crawl_pages(directory, pages, workers=None):
+    """
+    Parse the given HTML pages of `directory` across a process pool.
+    Yields (page, links to other pages in the corpus) in the order of
+    `pages`, as the pages are parsed.
+    """
+    known = set(pages)
+    with ProcessPoolExecutor(workers) as pool:
+        chunksize = max(1, len(pages) // ((workers or os.cpu_count()) * 16))
+        results = pool.map(_page_links, ((directory, page) for page in pages),
+                           chunksize=chunksize)
+        for page, links in zip(pages, results):
+            yield page, {link for link in links if link in known and link != page}
+
+
+def crawl_parallel(directory, workers=None):
+    """
+    Same result as `crawl`, with pages parsed in parallel.
+    """
+    return dict(crawl_pages(directory, list_pages(directory), workers))
+
+
+def crawl_to_edges(directory, path, workers=None):
+    """
+    Crawl `directory` in parallel straight into an edge list file at
+    `path`, without building the corpus dictionary.
+    """
+    pages = list_pages(directory)
+    index = {page: i for i, page in enumerate(pages)}
+    offsets = array("I", [0])
+    targets = array("I")
+    for _, links in crawl_pages(directory, pages, workers):
+        targets.extend(sorted(index[link] for link in links))
+        offsets.append(len(targets))
+    write_edges(path, pages, offsets, targets)
+
+
+def write_edges(path, pages, offsets, targets):
+    names = "\n".join(pages).encode("utf-8")
+    if sys.byteorder == "big":
+        offsets, targets = array("I", offsets), array("I", targets)
+        offsets.byteswap()
+        targets.byteswap()
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<II", len(pages), len(names)))
+        f.write(names)
+        f.write(offsets.tobytes())
+        f.write(targets.tobytes())
+    os.replace(tmp, path)
+
+
+def save_corpus(path, corpus: dict[str, set[str]]):
+    """
+    Write a corpus dictionary as an edge list file.
+    """
+    pages = sorted(corpus)
+    index = {page: i for i, page in enumerate(pages)}
+    offsets = array("I", [0])
+    targets = array("I")
+    for page in pages:
+        targets.extend(sorted(index[link] for link in corpus[page]))
+        offsets.append(len(targets))
+    write_edges(path, pages, offsets, targets)
+
+
+def read_edges(path):
+    """
+    Read an edge list file. Returns (pages, offsets, targets) where the
+    links of page `i` are `targets[offsets[i]:offsets[i + 1]]`.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not an edge list file")
+        count, names_length = struct.unpack("<II", f.read(8))
+        names = f.read(names_length).decode("utf-8")
+        pages = names.split("\n") if count else []
+        offsets = array("I")
+        offsets.frombytes(f.read(4 * (count + 1)))
+        if sys.byteorder == "big":
+            offsets.byteswap()
+        targets = array("I")
+        targets.frombytes(f.read(4 * offsets[-1]))
+        if sys.byteorder == "big":
+            targets.byteswap()
+    return pages, offsets, targets
+
+
+def load_corpus(path):
+    """
+    Read an edge list file back into the dictionary `crawl` returns,
+    for use with `sample_pagerank` and `iterate_pagerank`.
+    """
+    pages, offsets, targets = read_edges(path)
+    return {
+        page: {pages[j] for j in targets[offsets[i]:offsets[i + 1]]}
+        for i, page in enumerate(pages)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Crawl a directory of HTML pages into an edge list file.")
+    parser.add_argument("directory")
+    parser.add_argument("edges", help="output .edges file")
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+    crawl_to_edges(args.directory, args.edges, args.workers)
+
+
+if __name__ == "__main__":
+    main()
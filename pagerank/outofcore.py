@@ -0,0 +1,244 @@
+import argparse
+import os
+import struct
+import tempfile
+import time
+
+import numpy as np
+
+from crawler import MAGIC as EDGES_MAGIC
+from matrix import distance
+from pagerank import DAMPING
+
+# In-link file: magic, page count, link count, then little-endian arrays of
+# in-link offsets (uint64, page count + 1), inverse out-degrees (float64,
+# 0 for pages without links) and link sources grouped by target (uint32)
+MAGIC = b"PRINLNK1"
+HEADER = struct.Struct("<8sQQ")
+
+# Links read from disk at a time, bounding memory beyond the rank vectors
+BLOCK_EDGES = 1 << 22
+
+
+def map_edges(path):
+    """
+    Memory-map an edge list file written by `crawler`. Returns
+    (page count, offsets, targets) with the arrays left on disk.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(EDGES_MAGIC)) != EDGES_MAGIC:
+            raise ValueError(f"{path} is not an edge list file")
+        count, names_length = struct.unpack("<II", f.read(8))
+    start = len(EDGES_MAGIC) + 8 + names_length
+    offsets = np.memmap(path, dtype="<u4", mode="r", offset=start, shape=(count + 1,))
+    links = int(offsets[-1])
+    targets = np.memmap(path, dtype="<u4", mode="r", offset=start + 4 * (count + 1),
+                        shape=(links,)) if links else np.zeros(0, dtype="<u4")
+    return count, offsets, targets
+
+
+def read_pages(path):
+    """
+    Page names of an edge list file, without reading its links.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(EDGES_MAGIC)) != EDGES_MAGIC:
+            raise ValueError(f"{path} is not an edge list file")
+        count, names_length = struct.unpack("<II", f.read(8))
+        names = f.read(names_length).decode("utf-8")
+    return names.split("\n") if count else []
+
+
+def source_blocks(offsets, block_edges):
+    """
+    Split the rows of a CSR offsets array into consecutive (first, last)
+    row ranges holding about `block_edges` links each.
+    """
+    count = len(offsets) - 1
+    bounds = np.searchsorted(offsets, np.arange(0, int(offsets[-1]), block_edges), "right") - 1
+    bounds = np.unique(np.concatenate([bounds, [count]]))
+    if bounds[0] != 0:
+        bounds = np.concatenate([[0], bounds])
+    return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+
+def build_inlinks(edges_path, path, block_edges=BLOCK_EDGES):
+    """
+    Write the in-link file for an edge list file: the same links sorted
+    by target page, as a sort would do on disk. Links are read in blocks,
+    split into buckets of target pages holding about `block_edges` links,
+    spilled to temporary files, and each bucket is then sorted on its own.
+    """
+    count, offsets, targets = map_edges(edges_path)
+    links = len(targets)
+
+    # Out-degrees come straight from the offsets, in-degrees need a pass
+    in_degree = np.zeros(count, dtype=np.int64)
+    for first, last in source_blocks(offsets, block_edges):
+        block = targets[offsets[first]:offsets[last]]
+        in_degree += np.bincount(block, minlength=count)
+    in_offsets = np.zeros(count + 1, dtype=np.uint64)
+    np.cumsum(in_degree, out=in_offsets[1:])
+    del in_degree
+    buckets = source_blocks(in_offsets, block_edges)
+    starts = np.array([first for first, _ in buckets], dtype=np.int64)
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, count, links))
+    layout = _layout(count, links)
+    with open(tmp, "r+b") as f:
+        f.truncate(layout["size"])
+    out = np.memmap(tmp, dtype=np.uint8, mode="r+")
+    out_offsets, inverse, sources = _arrays(out, count, links)
+    out_offsets[:] = in_offsets
+    for first, last in source_blocks(offsets, block_edges):
+        degree = np.diff(offsets[first:last + 1]).astype(np.float64)
+        inverse[first:last] = np.divide(1, degree, out=np.zeros_like(degree),
+                                        where=degree > 0)
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(path))) as spill:
+        spill_files = [os.path.join(spill, str(i)) for i in range(len(buckets))]
+        for first, last in source_blocks(offsets, block_edges):
+            block_targets = np.asarray(targets[offsets[first]:offsets[last]], dtype=np.int64)
+            block_sources = np.repeat(np.arange(first, last, dtype=np.uint32),
+                                      np.diff(offsets[first:last + 1]))
+            bucket = np.searchsorted(starts, block_targets, "right") - 1
+            order = np.argsort(bucket, kind="stable")
+            splits = np.searchsorted(bucket[order], np.arange(len(buckets) + 1))
+            pairs = np.empty((len(order), 2), dtype="<u4")
+            pairs[:, 0] = block_targets[order]
+            pairs[:, 1] = block_sources[order]
+            for i in np.flatnonzero(np.diff(splits)):
+                with open(spill_files[i], "ab") as f:
+                    f.write(pairs[splits[i]:splits[i + 1]].tobytes())
+        for i, (first, last) in enumerate(buckets):
+            if not os.path.exists(spill_files[i]):
+                continue
+            pairs = np.fromfile(spill_files[i], dtype="<u4").reshape(-1, 2)
+            os.remove(spill_files[i])
+            # Blocks were spilled in source order, so a stable sort by
+            # target keeps each page's in-links sorted by source
+            order = np.argsort(pairs[:, 0], kind="stable")
+            sources[int(in_offsets[first]):int(in_offsets[last])] = pairs[order, 1]
+    out.flush()
+    del out, out_offsets, inverse, sources
+    os.replace(tmp, path)
+
+
+def _layout(count, links):
+    offsets = HEADER.size
+    inverse = offsets + 8 * (count + 1)
+    sources = inverse + 8 * count
+    return {"offsets": offsets, "inverse": inverse, "sources": sources,
+            "size": sources + 4 * links}
+
+
+def _arrays(buffer, count, links):
+    layout = _layout(count, links)
+    offsets = buffer[layout["offsets"]:layout["inverse"]].view("<u8")
+    inverse = buffer[layout["inverse"]:layout["sources"]].view("<f8")
+    sources = buffer[layout["sources"]:layout["size"]].view("<u4")
+    return offsets, inverse, sources
+
+
+class InLinks():
+    """
+    Memory-mapped in-link file. The links of the corpus stay on disk
+    and are read a block of target pages at a time.
+    """
+
+    def __init__(self, path, block_edges=BLOCK_EDGES):
+        with open(path, "rb") as f:
+            magic, count, links = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an in-link file")
+        self.count = count
+        self.links = links
+        self.buffer = np.memmap(path, dtype=np.uint8, mode="r")
+        self.offsets, self.inverse, self.sources = _arrays(self.buffer, count, links)
+        self.block_edges = block_edges
+        self.blocks = source_blocks(self.offsets, block_edges)
+
+    def __len__(self):
+        return self.count
+
+    def step(self, ranks, damping_factor):
+        """
+        One power iteration step, same as `LinkMatrix.step`, pulling
+        the rank each page receives from its in-links block by block.
+        """
+        n = self.count
+        scaled = np.empty(n)
+        dangling_mass = 0.0
+        # Inverse out-degrees are read as many pages at a time as links
+        for first in range(0, n, self.block_edges):
+            last = min(first + self.block_edges, n)
+            inverse = self.inverse[first:last]
+            np.multiply(ranks[first:last], inverse, out=scaled[first:last])
+            dangling_mass += ranks[first:last][inverse == 0].sum()
+        new_ranks = np.empty(n)
+        for first, last in self.blocks:
+            offsets = self.offsets[first:last + 1].astype(np.int64)
+            sources = self.sources[offsets[0]:offsets[-1]]
+            targets = np.repeat(np.arange(last - first), np.diff(offsets))
+            new_ranks[first:last] = np.bincount(targets, weights=scaled[sources],
+                                                minlength=last - first)
+        new_ranks += dangling_mass / n
+        new_ranks *= damping_factor
+        new_ranks += (1 - damping_factor) / n
+        return new_ranks
+
+
+def out_of_core_pagerank(edges_path, damping_factor, tolerance=0.001, norm="max",
+                         max_iterations=None, block_edges=BLOCK_EDGES, inlinks_path=None):
+    """
+    PageRank of an edge list file without loading its links into memory.
+
+    The links are sorted by target into an in-link file next to the edge
+    list (built once, then reused while it is newer than the edge list)
+    and every power iteration streams it from disk, so only the rank
+    vectors need to fit in memory. Stops like `power_iteration`.
+
+    Returns (pages, ranks, iterations) with ranks in the order of pages.
+    """
+    inlinks_path = inlinks_path or os.path.splitext(edges_path)[0] + ".inlinks"
+    if (not os.path.exists(inlinks_path)
+            or os.path.getmtime(inlinks_path) < os.path.getmtime(edges_path)):
+        build_inlinks(edges_path, inlinks_path, block_edges)
+    links = InLinks(inlinks_path, block_edges)
+    ranks = np.full(len(links), 1 / len(links))
+    iterations = 0
+    while max_iterations is None or iterations < max_iterations:
+        new_ranks = links.step(ranks, damping_factor)
+        iterations += 1
+        if distance(new_ranks, ranks, norm) <= tolerance:
+            ranks = new_ranks
+            break
+        ranks = new_ranks
+    return read_pages(edges_path), ranks, iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="PageRank of an edge list file streamed from disk.")
+    parser.add_argument("edges", help=".edges file written by crawler.py")
+    parser.add_argument("--threshold", type=float, default=0.001)
+    parser.add_argument("--norm", choices=("max", "l1", "l2"), default="max")
+    parser.add_argument("--max-iterations", type=int)
+    parser.add_argument("--block-edges", type=int, default=BLOCK_EDGES,
+                        help="links read from disk at a time")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    pages, ranks, iterations = out_of_core_pagerank(
+        args.edges, DAMPING, args.threshold, args.norm, args.max_iterations, args.block_edges)
+    seconds = time.perf_counter() - start
+    print(f"{iterations} iterations in {seconds:.3f}s")
+    print("PageRank Results from Iteration")
+    for page, rank in sorted(zip(pages, ranks.tolist())):
+        print(f"  {page}: {rank:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,141 @@
+import argparse
 import os
 import random
 import re
 import sys
 from collections import Counter
 
+from crawler import crawl_parallel, load_corpus, save_corpus
+from sampling import fast_sample_pagerank, parallel_sample_pagerank
+
 DAMPING = 0.85
 SAMPLES = 10000
 
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
+    parser = argparse.ArgumentParser(
+        usage="python pagerank.py corpus [--engine ENGINE] [--sampler SAMPLER] [--tolerance T] "
+              "[--max-samples N] [--workers N] [--save-edges FILE] [--solver SOLVER] "
+              "[--threshold T] [--norm NORM] [--max-iterations N] [--seeds PAGE,...] [--top K]")
+    parser.add_argument("corpus", help="directory of HTML pages, or an .edges file")
+    parser.add_argument("--workers", type=int,
+                        help="parse pages and run the parallel sampler with this many processes")
+    parser.add_argument("--save-edges", metavar="FILE",
+                        help="save the crawled link graph as an edge list file")
+    parser.add_argument("--sampler", choices=("model", "fast", "parallel"), default="model",
+                        help="how to draw the random surfer's steps")
+    parser.add_argument("--tolerance", type=float, default=0.001,
+                        help="target error of the parallel sampler")
+    parser.add_argument("--max-samples", type=int, metavar="N",
+                        help="stop the parallel sampler after about this many samples")
+    # Defaults of the options below are filled in after parsing, so that
+    # those that --top cannot honour are rejected only when actually given
+    parser.add_argument("--engine", choices=("loop", "sparse"),
+                        help="how to compute the iterative PageRank, loop by default")
+    parser.add_argument("--solver",
+                        choices=("jacobi", "gauss-seidel", "extrapolation", "adaptive"),
+                        help="iterative method of the sparse engine, jacobi by default")
+    parser.add_argument("--threshold", type=float,
+                        help="convergence threshold of the sparse engine, 0.001 by default")
+    parser.add_argument("--norm", choices=("max", "l1", "l2"),
+                        help="norm the threshold is measured in, max by default")
+    parser.add_argument("--max-iterations", type=int,
+                        help="stop the sparse engine after this many iterations")
+    parser.add_argument("--seeds", action="append", default=[], metavar="PAGE,...",
+                        help="also rank personalized to these seed pages, may be repeated")
+    parser.add_argument("--top", type=int, metavar="K",
+                        help="only print the K highest ranked pages, by rank")
+    args = parser.parse_args()
+    if args.tolerance <= 0:
+        parser.error("--tolerance must be positive")
+    if args.max_samples is not None and args.max_samples < 1:
+        parser.error("--max-samples must be at least 1")
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.top is not None and args.top < 1:
+        parser.error("--top must be at least 1")
+    if args.top:
+        given = [option for option, value in (("--engine", args.engine), ("--solver", args.solver),
+                                              ("--threshold", args.threshold),
+                                              ("--norm", args.norm))
+                 if value is not None]
+        if given:
+            parser.error(f"--top runs its own certified Jacobi iteration and cannot be "
+                         f"combined with {', '.join(given)}")
+    elif args.engine != "sparse":
+        # Personalized ranks honour the stopping options, never the solver
+        given = [option for option, value in (("--solver", args.solver),
+                                              ("--threshold", args.threshold),
+                                              ("--norm", args.norm),
+                                              ("--max-iterations", args.max_iterations))
+                 if value is not None and (option == "--solver" or not args.seeds)]
+        if given:
+            parser.error(f"the loop engine ignores {', '.join(given)}, use --engine sparse")
+    args.engine = args.engine or "loop"
+    args.solver = args.solver or "jacobi"
+    args.threshold = 0.001 if args.threshold is None else args.threshold
+    args.norm = args.norm or "max"
+    if args.corpus.endswith(".edges"):
+        corpus = load_corpus(args.corpus)
+    elif args.workers:
+        corpus = crawl_parallel(args.corpus, args.workers)
+    else:
+        corpus = crawl(args.corpus)
+    if args.save_edges:
+        save_corpus(args.save_edges, corpus)
+    seeds = [group.split(",") for group in args.seeds]
+    for page in (page for group in seeds for page in group):
+        if page not in corpus:
+            parser.error(f"seed page {page} is not in the corpus")
     """from pprint import pprint
     pprint(corpus)"""
-    ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
-    print(f"PageRank Results from Sampling (n = {SAMPLES})")
-    for page in sorted(ranks):
-        print(f"  {page}: {ranks[page]:.4f}")
-    ranks = iterate_pagerank(corpus, DAMPING)
-    print(f"PageRank Results from Iteration")
-    for page in sorted(ranks):
+    samples = SAMPLES
+    if args.sampler == "parallel":
+        ranks, samples, error = parallel_sample_pagerank(
+            corpus, DAMPING, args.tolerance, workers=args.workers, max_samples=args.max_samples,
+            progress=lambda n, error: print(f"  {n} samples, error {error:.4f}", file=sys.stderr))
+    elif args.sampler == "fast":
+        ranks = fast_sample_pagerank(corpus, DAMPING, SAMPLES)
+    else:
+        ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
+    print(f"PageRank Results from Sampling (n = {samples})")
+    if args.top:
+        pages = sorted(ranks, key=lambda page: (-ranks[page], page))[:args.top]
+    else:
+        pages = sorted(ranks)
+    for page in pages:
         print(f"  {page}: {ranks[page]:.4f}")
+    if args.top:
+        # NumPy and SciPy are only needed for top-k iteration
+        from matrix import LinkMatrix, top_k_pagerank
+        top, iterations, stable = top_k_pagerank(
+            LinkMatrix.from_corpus(corpus), DAMPING, args.top,
+            max_iterations=args.max_iterations)
+        print(f"Top {len(top)} PageRank Results from Iteration ({iterations} iterations, "
+              f"{'order certified' if stable else 'order not certified'})")
+        for page, rank in top:
+            print(f"  {page}: {rank:.4f}")
+    else:
+        if args.engine == "sparse":
+            # NumPy and SciPy are only needed for this engine
+            from matrix import sparse_pagerank
+            ranks = sparse_pagerank(corpus, DAMPING, args.threshold, args.solver,
+                                    norm=args.norm, max_iterations=args.max_iterations)
+        else:
+            ranks = iterate_pagerank(corpus, DAMPING)
+        print(f"PageRank Results from Iteration")
+        for page in sorted(ranks):
+            print(f"  {page}: {ranks[page]:.4f}")
+    if seeds:
+        # NumPy and SciPy are only needed for personalized ranks
+        from matrix import LinkMatrix, personalized_pagerank
+        results = personalized_pagerank(LinkMatrix.from_corpus(corpus), DAMPING, seeds,
+                                        args.threshold, norm=args.norm,
+                                        max_iterations=args.max_iterations)
+        for group, ranks in zip(seeds, results):
+            print(f"Personalized PageRank Results for {', '.join(group)}")
+            for page in sorted(ranks):
+                print(f"  {page}: {ranks[page]:.4f}")
 
 
 def crawl(directory):
@@ -0,0 +1,124 @@
+import math
+import os
+import random
+from collections import Counter
+from multiprocessing import Pool
+
+# Walkers needed before the normal 1.96 quantile is trusted as a stopping rule
+MIN_WALKERS = 30
+
+# Links of the corpus being sampled, set in each pool worker by `_init_worker`
+_links = None
+
+
+def sampling_tables(corpus: dict[str, set[str]]):
+    """
+    Precompute what a random surfer needs at each step: the list of pages
+    and, per page index, a tuple of the indices it links to.
+    """
+    pages = sorted(corpus)
+    index = {page: i for i, page in enumerate(pages)}
+    links = [tuple(index[link] for link in sorted(corpus[page])) for page in pages]
+    return pages, links
+
+
+def walk(links, damping_factor, n, rng=random):
+    """
+    Random surfer over page indices for `n` steps, starting at a random
+    page. Returns a Counter of visits per page index.
+
+    Each step first decides between teleporting (probability
+    1 - damping_factor) and following a link, then picks uniformly within
+    that choice. That draws from exactly the distribution given by
+    `transition_model`, but in constant time per step instead of
+    building and sampling an N entry distribution.
+    """
+    total = len(links)
+    visits = [0] * total
+    page = rng.randrange(total)
+    for _ in range(n):
+        visits[page] += 1
+        out = links[page]
+        if out and rng.random() < damping_factor:
+            page = out[rng.randrange(len(out))]
+        else:
+            # Teleport, or a page without links: every page equally likely
+            page = rng.randrange(total)
+    return Counter({page: count for page, count in enumerate(visits) if count})
+
+
+def fast_sample_pagerank(corpus: dict[str, set[str]], damping_factor, n: int, rng=random):
+    """
+    Same estimator as `sample_pagerank`, with constant time steps.
+
+    Return a dictionary where keys are page names, and values are
+    their estimated PageRank value (a value between 0 and 1). All
+    PageRank values should sum to 1.
+    """
+    pages, links = sampling_tables(corpus)
+    visits = walk(links, damping_factor, n, rng)
+    return {pages[page]: visits[page] / n for page in visits}
+
+
+def _init_worker(links):
+    global _links
+    _links = links
+
+
+def _walk_batch(args):
+    damping_factor, n, seed = args
+    return walk(_links, damping_factor, n, random.Random(seed))
+
+
+def parallel_sample_pagerank(corpus: dict[str, set[str]], damping_factor,
+                             tolerance=0.001, batch=10000, workers=None,
+                             max_samples=None, seed=None, progress=None):
+    """
+    Monte Carlo PageRank from many independent walkers run across a
+    process pool, stopping once the estimate is within `tolerance`.
+
+    Every walker takes `batch` steps. The spread of the per-walker
+    estimates gives a standard error for each page (batch means), and
+    sampling stops when 1.96 standard errors, roughly a 95% confidence
+    interval, is within `tolerance` for every page, or after `max_samples`.
+    The bound is only tested once at least MIN_WALKERS walkers are in,
+    as with fewer batch means the normal quantile understates the error.
+    `progress`, if given, is called after each round of walkers with
+    the samples so far and the current error bound.
+
+    Returns (ranks, samples, error) where ranks is the usual
+    dictionary of page names to estimated PageRank values.
+    """
+    pages, links = sampling_tables(corpus)
+    workers = workers or os.cpu_count()
+    rng = random.Random(seed)
+    visits = Counter()
+    # Per page sums of walker estimates and of their squares
+    sums = [0.0] * len(pages)
+    squares = [0.0] * len(pages)
+    walkers = 0
+    error = math.inf
+
+    with Pool(workers, initializer=_init_worker, initargs=(links,)) as pool:
+        while max_samples is None or walkers * batch < max_samples:
+            jobs = [(damping_factor, batch, rng.getrandbits(64)) for _ in range(workers)]
+            for counts in pool.imap_unordered(_walk_batch, jobs):
+                visits.update(counts)
+                walkers += 1
+                for page, count in counts.items():
+                    estimate = count / batch
+                    sums[page] += estimate
+                    squares[page] += estimate * estimate
+            if walkers >= 2:
+                error = 1.96 * max(
+                    math.sqrt(max(square - total * total / walkers, 0)
+                              / (walkers - 1) / walkers)
+                    for total, square in zip(sums, squares))
+            if progress is not None:
+                progress(walkers * batch, error)
+            if walkers >= MIN_WALKERS and error <= tolerance:
+                break
+
+    samples = walkers * batch
+    ranks = {pages[page]: visits[page] / samples for page in visits}
+    return ranks, samples, error